@@ -0,0 +1,80 @@
+"""Служебный HTTP-сервер: /metrics и другие эндпоинты администрирования."""
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+
+ADMIN_HOST = os.getenv('ADMIN_HOST', '127.0.0.1')
+# 0 — сервер не запускается
+ADMIN_PORT = int(os.getenv('ADMIN_PORT', 0))
+
+ROUTES = {}
+
+
+def route(path: str):
+    """
+    Зарегистрировать обработчик пути.
+
+    Обработчик получает dict параметров запроса и возвращает
+    (код ответа, content-type, тело str).
+    """
+    def decorator(handler):
+        ROUTES[path] = handler
+        return handler
+    return decorator
+
+
+@route('/metrics')
+def metrics_view(params):
+    return 200, 'text/plain; version=0.0.4', metrics.REGISTRY.render()
+
+
+class AdminHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 1 << 16
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        handler = ROUTES.get(url.path)
+        if handler is None:
+            status, content_type, body = 404, 'text/plain', 'Not found\n'
+        else:
+            try:
+                status, content_type, body = handler(parse_qs(url.query))
+            except Exception as e:
+                logging.error('Служебный сервер, %s: %s', url.path, e)
+                status, content_type, body = 500, 'text/plain', f'{e}\n'
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8'
+                         if 'charset' not in content_type else content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start(port: int = ADMIN_PORT, host: str = ADMIN_HOST):
+    """
+    Запустить служебный сервер в фоновом потоке.
+
+    Обработчики только читают состояние, поэтому цикл опроса
+    сервер не блокирует.
+    :return: ThreadingHTTPServer или None, если port == 0
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), AdminHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='admin', daemon=True
+    ).start()
+    logging.info(
+        'Служебный сервер: http://%s:%s/', host, server.server_port
+    )
+    return server
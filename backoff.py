@@ -0,0 +1,127 @@
+"""Экспоненциальные паузы после ошибок и автоматический выключатель."""
+import logging
+import os
+import random
+
+import clock
+
+BACKOFF_BASE = float(os.getenv('BACKOFF_BASE', 30))
+BACKOFF_MAX = float(os.getenv('BACKOFF_MAX', 3600))
+BACKOFF_JITTER = float(os.getenv('BACKOFF_JITTER', 0.2))
+CIRCUIT_THRESHOLD = int(os.getenv('CIRCUIT_THRESHOLD', 5))
+# Пробная попытка без результата дольше — выключатель снова размыкается
+CIRCUIT_PROBE_TIMEOUT = float(os.getenv('CIRCUIT_PROBE_TIMEOUT', 120))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class BackoffState:
+    """Состояние одного ключа: число ошибок подряд и выключатель."""
+
+    __slots__ = ('failures', 'delay', 'state', 'open_until')
+
+    def __init__(self):
+        self.failures = 0
+        self.delay = 0.0
+        self.state = CLOSED
+        self.open_until = 0.0
+
+
+class BackoffScheduler:
+    """
+    Паузы после ошибок отдельно для каждого ключа.
+
+    Ключ — вышестоящий сервис ('practicum', 'telegram'), аккаунт или
+    чат. Пауза растёт в factor раз после каждой ошибки подряд до
+    max_delay и размывается на ±jitter, чтобы повторы разных ключей
+    не совпадали. После threshold ошибок подряд выключатель
+    размыкается: allow() отказывает до истечения паузы, затем
+    пропускает одну пробную попытку (half-open). Если её результат
+    не учтён за probe_timeout секунд, выключатель снова размыкается.
+    Ничего не ждёт сам — только возвращает, сколько ждать.
+    """
+
+    def __init__(self, base: float = BACKOFF_BASE, factor: float = 2,
+                 max_delay: float = BACKOFF_MAX,
+                 jitter: float = BACKOFF_JITTER,
+                 threshold: int = CIRCUIT_THRESHOLD,
+                 probe_timeout: float = CIRCUIT_PROBE_TIMEOUT):
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.threshold = threshold
+        self.probe_timeout = probe_timeout
+        self._states = {}
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, key) -> BackoffState:
+        """Состояние ключа (по умолчанию — замкнутый выключатель)."""
+        return self._states.get(key) or BackoffState()
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def failure(self, key) -> float:
+        """
+        Учесть ошибку.
+
+        :param key: Ключ
+        :return: Пауза перед следующей попыткой в секундах
+        """
+        state = self._states.setdefault(key, BackoffState())
+        state.failures += 1
+        if state.delay:
+            state.delay = min(state.delay * self.factor, self.max_delay)
+        else:
+            state.delay = self.base
+        delay = self._jittered(state.delay)
+        if state.state == HALF_OPEN or state.failures >= self.threshold:
+            if state.state != OPEN:
+                logging.warning(
+                    '%s: выключатель разомкнут после %d ошибок подряд',
+                    key, state.failures
+                )
+            state.state = OPEN
+            state.open_until = clock.monotonic() + delay
+        return delay
+
+    def success(self, key):
+        """Учесть успешную попытку: пауза и выключатель сбрасываются."""
+        state = self._states.pop(key, None)
+        if state is not None and state.state != CLOSED:
+            logging.info('%s: выключатель замкнут', key)
+
+    def allow(self, key) -> float:
+        """
+        Можно ли обращаться к ключу сейчас.
+
+        :param key: Ключ
+        :return: 0, если можно, иначе сколько секунд подождать
+        """
+        state = self._states.get(key)
+        if state is None or state.state == CLOSED:
+            return 0.0
+        now = clock.monotonic()
+        if state.state == HALF_OPEN:
+            if now < state.open_until:
+                # Пробная попытка уже идёт, остальные ждут её результата
+                return self._jittered(self.base)
+            logging.warning(
+                '%s: нет результата пробной попытки, выключатель снова '
+                'разомкнут', key
+            )
+            state.state = OPEN
+            state.open_until = now + self._jittered(state.delay)
+            return state.open_until - now
+        wait = state.open_until - now
+        if wait > 0:
+            return wait
+        state.state = HALF_OPEN
+        state.open_until = now + self.probe_timeout
+        logging.info('%s: пробная попытка', key)
+        return 0.0
@@ -0,0 +1,149 @@
+"""
+Бенчмарк пропускной способности цикла опроса.
+
+Бот опрашивает N аккаунтов через локальные заглушки API Практикума и
+Telegram (benchmarks.stubs) и печатает опросы в секунду, перцентили
+задержки уведомлений (от смены статуса до получения сообщения
+заглушкой Telegram), процессорное время и память процесса бота.
+
+    python -m benchmarks.bench_throughput --accounts 1000 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from telegram import Bot  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+import homework  # noqa: E402
+import poller  # noqa: E402
+import subscriptions  # noqa: E402
+from benchmarks.stubs import Stubs  # noqa: E402
+from delivery import DeliveryQueue  # noqa: E402
+
+BENCH_TOKEN = '123456:bench'
+
+
+def rss_kb() -> int:
+    """Текущий RSS процесса в КБ (0, если /proc недоступен)."""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+    except OSError:
+        return 0
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def percentiles(values: list) -> dict:
+    """p50/p90/p99 в миллисекундах."""
+    if len(values) < 2:
+        value = values[0] * 1000 if values else None
+        return {'p50': value, 'p90': value, 'p99': value}
+    cuts = statistics.quantiles(values, n=100)
+    return {f'p{p}': round(cuts[p - 1] * 1000, 2) for p in (50, 90, 99)}
+
+
+async def drive(engine: poller.Poller, duration: float):
+    task = asyncio.create_task(engine.run())
+    await asyncio.sleep(duration)
+    engine.stop()
+    await task
+
+
+def run(accounts: int = 100, duration: float = 10, interval: float = 1,
+        concurrency: int = 32, latency: float = 0.0,
+        error_rate: float = 0.0, telegram_latency: float = 0.0,
+        telegram_error_rate: float = 0.0, change_rate: float = 0.1,
+        homeworks: int = 0) -> dict:
+    """
+    Прогнать бота против заглушек.
+
+    :return: Словарь с результатами замера
+    """
+    with Stubs(
+        {'latency': latency, 'error_rate': error_rate,
+         'change_rate': change_rate, 'homeworks': homeworks},
+        {'latency': telegram_latency, 'error_rate': telegram_error_rate},
+    ) as stubs:
+        endpoint, homework.ENDPOINT = homework.ENDPOINT, stubs.practicum_url
+        bot = Bot(
+            BENCH_TOKEN, base_url=stubs.telegram_url,
+            request=Request(con_pool_size=concurrency)
+        )
+        registry = subscriptions.SubscriptionRegistry()
+        for i in range(accounts):
+            registry.add(f'token{i}', i + 1)
+        queue = DeliveryQueue(bot, rate=1e9, chat_rate=1e9, retry_delay=0.1)
+        engine = poller.Poller(
+            registry.accounts(), bot, concurrency=concurrency,
+            delivery=queue, rps=1e9
+        )
+        engine.interval = poller.AdaptiveInterval(
+            base=interval, reviewing=interval, factor=1,
+            max_interval=interval
+        )
+        engine.backoff.base = interval
+        rss_before = rss_kb()
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.monotonic()
+        try:
+            asyncio.run(drive(engine, duration))
+        finally:
+            homework.ENDPOINT = endpoint
+        elapsed = time.monotonic() - started
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        practicum, telegram = stubs.stats()
+
+    changes = practicum['changes']
+    delays = [received - changes[name]
+              for name, received in telegram['received'] if name in changes]
+    cpu = (usage.ru_utime - usage_before.ru_utime
+           + usage.ru_stime - usage_before.ru_stime)
+    return {
+        'accounts': accounts,
+        'seconds': round(elapsed, 2),
+        'polls': practicum['requests'],
+        'polls_per_sec': round(practicum['requests'] / elapsed, 1),
+        'notifications': telegram['messages'],
+        'latency_ms': percentiles(delays),
+        'cpu_sec': round(cpu, 2),
+        'cpu_percent': round(100 * cpu / elapsed, 1),
+        'rss_kb': rss_kb(),
+        'rss_growth_kb': rss_kb() - rss_before,
+        'max_rss_kb': usage.ru_maxrss,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--interval', type=float, default=1,
+                        help='интервал опроса аккаунта, с')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='средняя задержка API Практикума, с')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-latency', type=float, default=0.0)
+    parser.add_argument('--telegram-error-rate', type=float, default=0.0)
+    parser.add_argument('--change-rate', type=float, default=0.1,
+                        help='вероятность смены статуса за запрос')
+    parser.add_argument('--homeworks', type=int, default=0,
+                        help='неизменных работ в каждом ответе')
+    args = parser.parse_args(argv)
+    homework.logging.getLogger().setLevel(homework.logging.WARNING)
+    result = run(**{key: value for key, value in vars(args).items()})
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""
+Долгий прогон бота с учётом удерживаемой памяти (tracemalloc).
+
+Цикл get_api_answer → check_response → parse_status → send_message
+(или движок poller.Poller на виртуальных часах) крутится против
+заглушек внутри процесса: ответы API отдаёт адаптер requests без
+сети, сообщения принимает фиктивный бот. После прогрева через
+равные промежутки снимается объём памяти, выделенной и не
+освобождённой Python; рост на итерацию считается наклоном прямой
+по этим замерам. Если он больше бюджета, прогон не пройден (код 1):
+
+    python -m benchmarks.soak --iterations 1000000
+    python -m benchmarks.soak --mode engine --accounts 1000 --days 30
+"""
+import argparse
+import asyncio
+import gc
+import io
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import requests  # noqa: E402
+from requests.adapters import BaseAdapter  # noqa: E402
+
+import clock  # noqa: E402
+import homework  # noqa: E402
+import poller  # noqa: E402
+import transport  # noqa: E402
+from benchmarks.stubs import STATUSES  # noqa: E402
+from delivery import DeliveryQueue  # noqa: E402
+
+SOAK_ENDPOINT = 'http://soak.invalid/api/user_api/homework_statuses/'
+# Допустимый рост удерживаемой памяти, байт на итерацию
+BUDGET = 1.0
+# Сколько самых выросших мест выделения памяти показать
+TOP = 10
+
+
+class PracticumAdapter(BaseAdapter):
+    """
+    Ответы homework_statuses без сети.
+
+    У каждого токена одна работа; её статус меняется на каждом
+    change_every-м запросе токена — без случайности, чтобы прогоны
+    были сравнимы. current_date растёт с каждым запросом, поэтому
+    адреса запросов не повторяются и ограниченные кэши (например,
+    urllib.parse) заполняются ещё при прогреве.
+    """
+
+    def __init__(self, change_every: int = 10):
+        super().__init__()
+        self.change_every = change_every
+        self.requests = 0
+        self._counts = {}
+        self._now = 0
+
+    def send(self, request, **kwargs):
+        token = request.headers.get('Authorization', '')[len('OAuth '):]
+        count = self._counts.get(token, 0)
+        self._counts[token] = count + 1
+        self.requests += 1
+        change = count // self.change_every
+        now = self._now = max(int(clock.time()), self._now + 1)
+        body = json.dumps({
+            'homeworks': [{
+                'id': 1,
+                'status': STATUSES[change % len(STATUSES)],
+                'homework_name': f'{token}.zip',
+                'reviewer_comment': 'Заглушка',
+                'date_updated': time.strftime(
+                    '%Y-%m-%dT%H:%M:%SZ', time.gmtime(now - 1)
+                ),
+                'lesson_name': 'Долгий прогон',
+            }] if count % self.change_every == 0 else [],
+            'current_date': now,
+        }).encode()
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class StandInBot:
+    """Фиктивный бот: только считает сообщения."""
+
+    def __init__(self):
+        self.messages = 0
+
+    def send_message(self, chat_id, text):
+        self.messages += 1
+
+
+class MemoryProbe:
+    """Замеры удерживаемой памяти tracemalloc после сборки мусора."""
+
+    def __init__(self):
+        self.samples = []
+        self.baseline = None
+
+    def start(self):
+        gc.collect()
+        self.baseline = tracemalloc.take_snapshot()
+
+    def sample(self, iteration: int):
+        gc.collect()
+        self.samples.append((iteration, tracemalloc.get_traced_memory()[0]))
+
+    def slope(self) -> float:
+        """Рост памяти на итерацию, байт (наименьшие квадраты)."""
+        if len(self.samples) < 2:
+            return 0.0
+        count = len(self.samples)
+        mean_x = sum(x for x, _ in self.samples) / count
+        mean_y = sum(y for _, y in self.samples) / count
+        spread = sum((x - mean_x) ** 2 for x, _ in self.samples)
+        if not spread:
+            return 0.0
+        return sum((x - mean_x) * (y - mean_y)
+                   for x, y in self.samples) / spread
+
+    def top(self, limit: int = TOP) -> list:
+        """Места, где удерживаемая память выросла сильнее всего."""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        return [str(stat) for stat in snapshot.compare_to(
+            self.baseline, 'lineno'
+        )[:limit] if stat.size_diff > 0]
+
+
+def soak_cycle(iterations: int, probe: MemoryProbe, samples: int,
+               warmup: int, bot: StandInBot):
+    """Цикл функций homework, как в одном обороте старого main()."""
+    timestamp = 0
+    every = max(iterations // samples, 1)
+    for iteration in range(-warmup, iterations):
+        if iteration == 0:
+            probe.start()
+        if iteration >= 0 and not iteration % every:
+            probe.sample(iteration)
+        response = homework.get_api_answer(timestamp)
+        for item in homework.check_response(response):
+            homework.send_message(bot, homework.parse_status(item))
+        timestamp = response['current_date']
+    probe.sample(iterations)
+    return iterations
+
+
+def soak_engine(accounts: int, days: float, probe: MemoryProbe,
+                samples: int, warmup: int, bot: StandInBot):
+    """
+    Движок опроса на виртуальных часах; итерация — один опрос.
+
+    Замеры начинаются после warmup опросов и идут days виртуальных
+    суток.
+    """
+    polls = [0]
+
+    def fetch(token, current_date):
+        polls[0] += 1
+        return homework.get_account_answer(token, current_date)
+
+    async def scenario(engine):
+        engine_task = asyncio.create_task(engine.run())
+        step = days * 86400 / samples
+        while polls[0] < warmup:
+            await asyncio.sleep(step)
+        start = polls[0]
+        probe.start()
+        for _ in range(samples):
+            probe.sample(polls[0] - start)
+            await asyncio.sleep(step)
+        await engine.delivery.join()
+        probe.sample(polls[0] - start)
+        engine.stop()
+        await engine_task
+        return polls[0] - start
+
+    with clock.use(clock.VirtualClock()) as virtual:
+        queue = DeliveryQueue(bot, rate=1e9, chat_rate=1e9)
+        engine = poller.Poller(
+            [poller.Account(f'token{i}', {str(i)}) for i in range(accounts)],
+            bot, delivery=queue, rps=1e9, fetch=fetch
+        )
+        return virtual.run(scenario(engine))
+
+
+def run(mode: str = 'cycle', iterations: int = 100000, accounts: int = 100,
+        days: float = 7, samples: int = 20, warmup: int = 1000,
+        budget: float = BUDGET, change_every: int = 10,
+        frames: int = 1) -> dict:
+    """
+    Прогнать бота и оценить рост удерживаемой памяти.
+
+    :param mode: 'cycle' — функции homework подряд, 'engine' — движок
+        poller.Poller на виртуальных часах
+    :param iterations: Итераций в режиме cycle
+    :param accounts: Аккаунтов в режиме engine
+    :param days: Виртуальных суток в режиме engine
+    :param warmup: Итераций (опросов) прогрева до первого замера
+    :param budget: Допустимый рост, байт на итерацию
+    :return: Словарь с результатами; ok — уложились ли в бюджет
+    """
+    adapter = PracticumAdapter(change_every)
+    client = transport.Transport()
+    client.session.mount(SOAK_ENDPOINT, adapter)
+    previous = transport.get_transport()
+    endpoint, homework.ENDPOINT = homework.ENDPOINT, SOAK_ENDPOINT
+    transport.set_transport(client)
+    bot = StandInBot()
+    probe = MemoryProbe()
+    tracemalloc.start(frames)
+    started = time.monotonic()
+    try:
+        if mode == 'engine':
+            done = soak_engine(accounts, days, probe, samples, warmup, bot)
+        else:
+            done = soak_cycle(iterations, probe, samples, warmup, bot)
+        top = probe.top()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        homework.ENDPOINT = endpoint
+        transport.set_transport(previous)
+    per_iteration = probe.slope()
+    return {
+        'mode': mode,
+        'iterations': done,
+        'seconds': round(time.monotonic() - started, 2),
+        'requests': adapter.requests,
+        'messages': bot.messages,
+        'retained_bytes': probe.samples[-1][1] - probe.samples[0][1],
+        'peak_bytes': peak,
+        'bytes_per_iteration': round(per_iteration, 4),
+        'budget': budget,
+        'ok': per_iteration <= budget,
+        'top': top,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--mode', choices=('cycle', 'engine'),
+                        default='cycle')
+    parser.add_argument('--iterations', type=int, default=1000000)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--days', type=float, default=30,
+                        help='виртуальных суток в режиме engine')
+    parser.add_argument('--samples', type=int, default=20,
+                        help='сколько раз замерить память')
+    parser.add_argument('--warmup', type=int, default=1000,
+                        help='итераций прогрева до первого замера')
+    parser.add_argument('--budget', type=float, default=BUDGET,
+                        help='допустимый рост, байт на итерацию')
+    parser.add_argument('--change-every', type=int, default=10,
+                        help='статус меняется каждый N-й запрос токена')
+    parser.add_argument('--frames', type=int, default=1,
+                        help='глубина стека в отчёте tracemalloc')
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    result = run(**vars(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
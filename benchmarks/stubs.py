@@ -0,0 +1,266 @@
+"""
+Локальные заглушки API Практикума и Bot API Telegram.
+
+Заглушки запускаются в отдельном процессе (Stubs), чтобы нагрузка
+на них не попадала в замеры CPU и памяти бота. Статистика доступна
+по GET /stats каждой заглушки.
+"""
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pipe, Process
+from urllib.parse import parse_qs, urlparse
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+HOMEWORK_NAME = re.compile(r'"([^"]+)"')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Общая часть заглушек: задержка, ошибки, JSON-ответы."""
+
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят одним пакетом, иначе keep-alive соединение
+    # ловит задержку подтверждения TCP (~40 мс) на каждом ответе
+    wbufsize = 1 << 16
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate(self) -> bool:
+        """Задержка и случайная ошибка; True, если ответ уже отправлен."""
+        options = self.server.options
+        if options['latency']:
+            time.sleep(random.expovariate(1 / options['latency']))
+        if random.random() < options['error_rate']:
+            self.reply(500, self.error_body())
+            return True
+        return False
+
+    def error_body(self):
+        return {'code': 'stub', 'message': 'Ошибка заглушки'}
+
+    def stats(self) -> bool:
+        if self.path != '/stats':
+            return False
+        with self.server.lock:
+            self.reply(200, self.server.stats)
+        return True
+
+
+class PracticumHandler(StubHandler):
+    """
+    Заглушка homework_statuses.
+
+    У каждого токена одна «живая» работа, статус которой меняется
+    с вероятностью change_rate на каждый запрос, плюс homeworks
+    неизменных работ для объёма ответа. Время смены статуса
+    записывается в stats['changes'] по имени работы.
+    """
+
+    def do_GET(self):
+        if self.stats() or self.simulate():
+            return
+        token = self.headers.get('Authorization', '').replace('OAuth ', '')
+        from_date = int(parse_qs(urlparse(self.path).query)['from_date'][0])
+        server = self.server
+        now = time.time()
+        with server.lock:
+            server.stats['requests'] += 1
+            seq, status, changed = server.tokens.get(token, (0, None, now))
+            if status is None or random.random() < server.options[
+                    'change_rate']:
+                seq, status, changed = seq + 1, random.choice(STATUSES), now
+                server.tokens[token] = (seq, status, changed)
+                server.stats['changes'][f'{token}-{seq}'] = now
+        updated = datetime.fromtimestamp(changed, timezone.utc).strftime(
+            '%Y-%m-%dT%H:%M:%SZ'
+        )
+        homeworks = [{
+            'id': seq,
+            'status': status,
+            'homework_name': f'{token}-{seq}',
+            'reviewer_comment': 'Заглушка',
+            'date_updated': updated,
+            'lesson_name': 'Бенчмарк',
+        }]
+        homeworks.extend({
+            'id': -i,
+            'status': 'approved',
+            'homework_name': f'{token}-old-{i}',
+            'reviewer_comment': 'x' * 200,
+            'date_updated': '2020-01-01T00:00:00Z',
+            'lesson_name': 'Бенчмарк',
+        } for i in range(server.options['homeworks']))
+        self.reply(200, {
+            'homeworks': homeworks,
+            'current_date': max(int(now), from_date)
+        })
+
+
+class TelegramHandler(StubHandler):
+    """
+    Заглушка sendMessage и getUpdates Bot API.
+
+    Записывает время получения каждого сообщения по имени работы
+    в stats['received'], а чат и текст — в stats['texts'].
+    Входящие сообщения для getUpdates добавляются POST /push
+    с телом {"chat_id": ..., "text": ...}.
+    """
+
+    def error_body(self):
+        return {'ok': False, 'error_code': 500, 'description': 'stub'}
+
+    def do_GET(self):
+        if not self.stats():
+            self.reply(404, self.error_body())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        method = self.path.rsplit('/', 1)[-1]
+        if method == 'push':
+            self.push(data)
+            return
+        if method == 'getUpdates':
+            self.get_updates(data)
+            return
+        if self.simulate():
+            return
+        now = time.time()
+        match = HOMEWORK_NAME.search(data.get('text', ''))
+        with self.server.lock:
+            self.server.stats['messages'] += 1
+            self.server.stats['texts'].append(
+                [data.get('chat_id'), data.get('text', '')]
+            )
+            if match:
+                self.server.stats['received'].append([match.group(1), now])
+        self.reply(200, {'ok': True, 'result': {
+            'message_id': self.server.stats['messages'],
+            'date': int(now),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
+
+    def push(self, data):
+        server = self.server
+        with server.lock:
+            update_id = len(server.updates) + 1
+            server.updates.append({
+                'update_id': update_id,
+                'message': {
+                    'message_id': update_id,
+                    'date': int(time.time()),
+                    'chat': {'id': int(data['chat_id']), 'type': 'private'},
+                    'from': {'id': int(data['chat_id']), 'is_bot': False,
+                             'first_name': 'Stub'},
+                    'text': data['text'],
+                },
+            })
+            server.new_update.notify_all()
+        self.reply(200, {'ok': True, 'result': update_id})
+
+    def get_updates(self, data):
+        """Длинный опрос: ждёт обновлений не дольше timeout."""
+        offset = int(data.get('offset') or 0)
+        server = self.server
+        with server.new_update:
+            server.new_update.wait_for(
+                lambda: any(update['update_id'] >= offset
+                            for update in server.updates),
+                timeout=min(float(data.get('timeout') or 0), 5)
+            )
+            updates = [update for update in server.updates
+                       if update['update_id'] >= offset]
+        self.reply(200, {'ok': True, 'result': updates})
+
+
+def make_server(handler, **options) -> ThreadingHTTPServer:
+    """Создать заглушку на свободном порту 127.0.0.1."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.options = {
+        'latency': 0.0, 'error_rate': 0.0, 'change_rate': 0.1,
+        'homeworks': 0, **options
+    }
+    server.lock = threading.Lock()
+    server.new_update = threading.Condition(server.lock)
+    server.tokens = {}
+    server.updates = []
+    server.stats = {'requests': 0, 'changes': {}, 'messages': 0,
+                    'received': [], 'texts': []}
+    server.handle_error = lambda request, address: None
+    return server
+
+
+def _serve(connection, practicum_options, telegram_options):
+    servers = [
+        make_server(PracticumHandler, **practicum_options),
+        make_server(TelegramHandler, **telegram_options),
+    ]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    connection.send([server.server_port for server in servers])
+    connection.recv()
+    for server in servers:
+        server.shutdown()
+
+
+class Stubs:
+    """Заглушки в дочернем процессе; адреса в practicum_url и telegram_url."""
+
+    def __init__(self, practicum_options: dict = None,
+                 telegram_options: dict = None):
+        self._connection, child = Pipe()
+        self._process = Process(
+            target=_serve,
+            args=(child, practicum_options or {}, telegram_options or {}),
+            daemon=True
+        )
+        self._process.start()
+        practicum_port, telegram_port = self._connection.recv()
+        self.practicum_url = (
+            f'http://127.0.0.1:{practicum_port}'
+            '/api/user_api/homework_statuses/'
+        )
+        self.telegram_url = f'http://127.0.0.1:{telegram_port}/bot'
+        self.push_url = f'http://127.0.0.1:{telegram_port}/push'
+        self.stats_urls = (
+            f'http://127.0.0.1:{practicum_port}/stats',
+            f'http://127.0.0.1:{telegram_port}/stats',
+        )
+
+    def stats(self):
+        """Статистика обеих заглушек: (practicum, telegram)."""
+        import requests
+
+        return tuple(requests.get(url).json() for url in self.stats_urls)
+
+    def push(self, chat_id, text: str):
+        """Входящее сообщение пользователя для getUpdates."""
+        import requests
+
+        requests.post(self.push_url, json={'chat_id': chat_id, 'text': text})
+
+    def close(self):
+        """Остановить заглушки."""
+        self._connection.send(None)
+        self._process.join(5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
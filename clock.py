@@ -0,0 +1,194 @@
+"""
+Часы бота: настоящие или виртуальные для ускоренного прогона.
+
+Все решения о времени (расписание опроса, паузы после ошибок,
+лимиты частоты, дубли запросов) берут время через time(),
+monotonic() и sleep() этого модуля. По умолчанию это системные часы.
+VirtualClock мгновенно перематывает время, когда всем задачам цикла
+событий остаётся только ждать, поэтому неделя опроса с паузами и
+наращиванием интервалов проходит за секунды:
+
+    with clock.use(clock.VirtualClock()) as virtual:
+        virtual.run(engine.run())
+"""
+import asyncio
+import contextlib
+import selectors
+import threading
+import time as _time
+
+VIRTUAL_TICK = 1e-6
+
+
+class SystemClock:
+    """Системное время."""
+
+    def time(self) -> float:
+        return _time.time()
+
+    def monotonic(self) -> float:
+        return _time.monotonic()
+
+    def sleep(self, seconds: float):
+        _time.sleep(seconds)
+
+    def run(self, coroutine):
+        """Выполнить корутину в новом цикле событий (asyncio.run)."""
+        return asyncio.run(coroutine)
+
+
+class VirtualClock:
+    """
+    Время, которое идёт только при ожидании.
+
+    sleep() сдвигает время сразу на заданное число секунд. Цикл
+    событий из new_event_loop() считает таймеры по этим часам: когда
+    готовых задач нет и ни один поток пула (run_in_executor) не
+    работает, часы перематываются к ближайшему таймеру. Пока поток
+    пула занят, время стоит — работа в потоках «мгновенна».
+    """
+
+    def __init__(self, start: float = None):
+        self._start = _time.time() if start is None else start
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._start + self._elapsed
+
+    def monotonic(self) -> float:
+        # Та же шкала, что у time(): паузы, посчитанные по monotonic(),
+        # и расписание по time() округляются одинаково
+        return self._start + self._elapsed
+
+    def advance(self, seconds: float):
+        """Перевести часы вперёд на seconds секунд."""
+        if seconds > 0:
+            with self._lock:
+                self._elapsed += seconds
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def new_event_loop(self):
+        return VirtualEventLoop(self)
+
+    def run(self, coroutine):
+        """Выполнить корутину в цикле событий с виртуальным временем."""
+        loop = self.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(coroutine)
+        finally:
+            try:
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(
+                    asyncio.gather(*tasks, return_exceptions=True)
+                )
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.run_until_complete(loop.shutdown_default_executor())
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Селектор, который вместо ожидания таймера перематывает часы."""
+
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        if self.loop.busy or timeout == 0:
+            return super().select(timeout)
+        events = super().select(0)
+        if events or timeout is None:
+            return events or super().select(None)
+        # Не меньше микросекунды: меньший шаг теряется в time() (время
+        # эпохи), и ожидание «ещё чуть-чуть» повторялось бы бесконечно
+        self.loop.clock.advance(max(timeout, VIRTUAL_TICK))
+        return []
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """Цикл событий, для которого время — VirtualClock."""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.busy = 0
+        super().__init__(_VirtualSelector(self))
+        # Таймеры ближе этого срабатывают сразу; системное значение
+        # (наносекунды) меньше шага float во времени эпохи
+        self._clock_resolution = VIRTUAL_TICK
+
+    def time(self) -> float:
+        return self.clock.monotonic()
+
+    def call_later(self, delay, callback, *args, **kwargs):
+        # Таймер ближе шага часов срабатывает сразу, не сдвигая время,
+        # и ожидание вроде TokenBucket с огромным rate не кончилось бы
+        if delay > 0:
+            delay = max(delay, 2 * VIRTUAL_TICK)
+        return super().call_later(delay, callback, *args, **kwargs)
+
+    def call_at(self, when, callback, *args, **kwargs):
+        if when > self.time():
+            when = max(when, self.time() + 2 * VIRTUAL_TICK)
+        return super().call_at(when, callback, *args, **kwargs)
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.busy += 1
+        future.add_done_callback(self._idle)
+        return future
+
+    def _idle(self, future):
+        self.busy -= 1
+
+
+_clock = SystemClock()
+
+
+def get_clock():
+    """Текущие часы процесса."""
+    return _clock
+
+
+def set_clock(clock):
+    """Заменить часы процесса; вернуть прежние."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextlib.contextmanager
+def use(clock):
+    """Временно заменить часы процесса."""
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
+
+
+def time() -> float:
+    """Текущее время, как time.time()."""
+    return _clock.time()
+
+
+def monotonic() -> float:
+    """Монотонное время, как time.monotonic()."""
+    return _clock.monotonic()
+
+
+def sleep(seconds: float):
+    """Блокирующая пауза, как time.sleep()."""
+    _clock.sleep(seconds)
+
+
+def run(coroutine):
+    """Выполнить корутину в цикле событий текущих часов."""
+    return _clock.run(coroutine)
@@ -0,0 +1,308 @@
+"""Команды бота в Telegram: /status, /history, /subscribe."""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import homework
+from backoff import BackoffScheduler
+from delivery import MESSAGE_LIMIT
+
+# Принимать команды (long polling getUpdates); по умолчанию бот только
+# отправляет уведомления
+TELEGRAM_COMMANDS = os.getenv('TELEGRAM_COMMANDS', '0') != '0'
+# Сколько секунд Telegram держит запрос getUpdates без новых сообщений
+COMMANDS_POLL_TIMEOUT = int(os.getenv('COMMANDS_POLL_TIMEOUT', 25))
+HISTORY_LIMIT = 10
+HISTORY_MAX = 50
+# Сколько работ показывает /status (новые первыми)
+STATUS_LIMIT = 20
+# Сколько токенов можно подписать на один чат
+SUBSCRIPTIONS_PER_CHAT = int(os.getenv('SUBSCRIPTIONS_PER_CHAT', 5))
+UPSTREAM = 'telegram_updates'
+_UNCHECKED = object()
+
+HELP = (
+    'Команды:\n'
+    '/status — текущие статусы работ\n'
+    '/history [N] — последние изменения статусов\n'
+    '/subscribe <токен Практикума> — получать уведомления\n'
+    '/unsubscribe — отписаться от всех токенов'
+)
+
+
+def _when(moment) -> str:
+    if not moment:
+        return '—'
+    return time.strftime('%d.%m.%Y %H:%M', time.localtime(moment))
+
+
+def _verdict(status: str) -> str:
+    return homework.HOMEWORK_STATUSES.get(status, status)
+
+
+def check_token(token: str):
+    """
+    Проверить токен Практикума одним запросом к API.
+
+    :return: None, если токен рабочий, иначе текст ошибки для пользователя
+    """
+    import clock
+
+    try:
+        homework.check_response(
+            homework.get_account_answer(token, int(clock.time()))
+        )
+    except homework.UpstreamError as e:
+        logging.warning('Проверка токена: %s', e)
+        return 'Практикум сейчас недоступен, попробуйте позже'
+    except (homework.PracticumException, KeyError, TypeError) as e:
+        logging.info('Проверка токена: %s', e)
+        return 'Практикум не принял токен'
+    return None
+
+
+class Commands:
+    """
+    Ответы на команды из состояния процесса (API — только /subscribe).
+
+    /status читает снимок статусов движка (tracker.StatusIndex),
+    /history — историю изменений из хранилища, /subscribe добавляет
+    подписку в реестр, и новый токен сразу попадает в расписание
+    движка. Неизвестный токен перед подпиской проверяется запросом
+    к API (check_token); на чат — не больше SUBSCRIPTIONS_PER_CHAT
+    токенов. Ответ — строка или None, если команда не распознана.
+    """
+
+    def __init__(self, registry, engine, store=None, check=check_token,
+                 per_chat: int = SUBSCRIPTIONS_PER_CHAT):
+        self.registry = registry
+        self.engine = engine
+        self.store = store
+        self.check = check
+        self.per_chat = per_chat
+        # {токен: результат check}, проверенные заранее в prepare()
+        self._checked = {}
+        self.handlers = {
+            '/start': self.help,
+            '/help': self.help,
+            '/status': self.status,
+            '/history': self.history,
+            '/subscribe': self.subscribe,
+            '/unsubscribe': self.unsubscribe,
+        }
+
+    def handle(self, chat_id, text: str):
+        """
+        Ответ на сообщение пользователя.
+
+        :param chat_id: Идентификатор чата
+        :param text: Текст сообщения
+        :return: Текст ответа или None
+        """
+        parsed = self._parse(text)
+        if parsed is None:
+            return None
+        handler, args = parsed
+        return handler(str(chat_id), args)
+
+    def _parse(self, text: str):
+        words = text.split()
+        if not words:
+            return None
+        # /status@имя_бота в групповых чатах
+        handler = self.handlers.get(words[0].split('@')[0].lower())
+        if handler is None:
+            return None
+        return handler, words[1:]
+
+    def prepare(self, text: str):
+        """
+        Блокирующая часть команды: проверка токена для /subscribe.
+
+        Вызывается в потоке приёма команд до handle(), чтобы запрос
+        к API не останавливал цикл событий.
+        :param text: Текст сообщения
+        """
+        parsed = self._parse(text)
+        if parsed is None or parsed[0] != self.subscribe:
+            return
+        args = parsed[1]
+        if len(args) == 1 and self.registry.get(args[0]) is None:
+            self._checked[args[0]] = self.check(args[0])
+
+    def help(self, chat_id, args):
+        return HELP
+
+    def _accounts(self, chat_id):
+        return self.registry.chats_of(chat_id)
+
+    def status(self, chat_id, args):
+        accounts = self._accounts(chat_id)
+        if not accounts:
+            return 'Нет подписок. ' + HELP
+        lines = []
+        for account in accounts:
+            homeworks = self.engine.index.homeworks(account.key)
+            lines.append(
+                f'Аккаунт {account.key[:8]}, опрошен '
+                f'{_when(account.last_success)}:'
+            )
+            if not homeworks:
+                lines.append('  изменений статусов пока не было')
+            for item in homeworks[:STATUS_LIMIT]:
+                lines.append(
+                    f'  {item.name}: {_verdict(item.status)} '
+                    f'({_when(item.updated)})'
+                )
+            if len(homeworks) > STATUS_LIMIT:
+                lines.append(f'  … и ещё {len(homeworks) - STATUS_LIMIT}')
+        return '\n'.join(lines)
+
+    def history(self, chat_id, args):
+        accounts = self._accounts(chat_id)
+        if not accounts:
+            return 'Нет подписок. ' + HELP
+        if self.store is None:
+            return 'История не сохраняется'
+        try:
+            limit = min(int(args[0]), HISTORY_MAX) if args else HISTORY_LIMIT
+        except ValueError:
+            return 'Использование: /history [N]'
+        lines = []
+        for account in accounts:
+            rows = self.store.load_history(account.key, max(limit, 1))
+            lines.append(f'Аккаунт {account.key[:8]}:')
+            if not rows:
+                lines.append('  история пуста')
+            for name, status, _, noticed in rows:
+                lines.append(
+                    f'  {_when(noticed)} {name}: {_verdict(status)}'
+                )
+        return '\n'.join(lines)
+
+    def subscribe(self, chat_id, args):
+        if len(args) != 1:
+            return 'Использование: /subscribe <токен Практикума>'
+        token = args[0]
+        checked = self._checked.pop(token, _UNCHECKED)
+        account = self.registry.get(token)
+        if account is not None and chat_id in account.chats:
+            return f'Подписка на аккаунт {account.key[:8]} уже есть'
+        if len(self._accounts(chat_id)) >= self.per_chat:
+            return (f'Не больше {self.per_chat} подписок на чат, '
+                    'лишние можно убрать через /unsubscribe')
+        if account is None:
+            # Мусорные токены иначе опрашивались бы вечно
+            problem = self.check(token) if checked is _UNCHECKED else checked
+            if problem:
+                return problem
+        # Аккаунт без подписчиков выпал из расписания движка
+        idle = account is None or not account.chats
+        account, _ = self.registry.add(token, chat_id, persist=True)
+        if idle:
+            self.engine.add(account)
+        logging.info('Чат %s подписан на %s', chat_id, account,
+                     extra={'chat': chat_id, 'account': account.key})
+        return (f'Подписка на аккаунт {account.key[:8]} оформлена. '
+                'Сообщение с токеном лучше удалить.')
+
+    def unsubscribe(self, chat_id, args):
+        accounts = self._accounts(chat_id)
+        for account in accounts:
+            self.registry.remove(account.token, chat_id)
+        return f'Отписано от аккаунтов: {len(accounts)}'
+
+
+class CommandListener:
+    """
+    Получение команд длинным опросом getUpdates.
+
+    Запрос getUpdates висит до COMMANDS_POLL_TIMEOUT секунд в своём
+    потоке и не занимает пул опроса Практикума. Ответы ставятся в ту
+    же очередь delivery.DeliveryQueue, что и уведомления, поэтому
+    подчиняются тем же ограничениям частоты Telegram. После ошибки
+    getUpdates повтор откладывается по backoff.BackoffScheduler
+    с ключом 'telegram_updates'.
+    """
+
+    def __init__(self, bot, commands: Commands, delivery,
+                 timeout: int = COMMANDS_POLL_TIMEOUT, backoff=None):
+        self.bot = bot
+        self.commands = commands
+        self.delivery = delivery
+        self.timeout = timeout
+        self.backoff = BackoffScheduler() if backoff is None else backoff
+        self.offset = None
+        self._running = False
+
+    def _get_updates(self):
+        return self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout,
+            allowed_updates=['message']
+        )
+
+    def dispatch(self, update):
+        """Ответить на одно обновление."""
+        self.offset = update.update_id + 1
+        message = update.message
+        if message is None or not message.text:
+            return
+        chat_id = str(message.chat_id)
+        try:
+            reply = self.commands.handle(chat_id, message.text)
+        except Exception as e:
+            homework.ERRORS.labels('command', type(e).__name__).inc()
+            logging.error('Команда в чате %s: %s', chat_id, e,
+                          extra={'chat': chat_id})
+            reply = 'Не удалось выполнить команду'
+        if reply:
+            if len(reply) > MESSAGE_LIMIT:
+                reply = reply[:MESSAGE_LIMIT - 1] + '…'
+            self.delivery.put(chat_id, reply)
+
+    async def run(self):
+        """Принимать команды до stop()."""
+        from telegram import error
+
+        self._running = True
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='commands') as executor:
+            while self._running:
+                try:
+                    updates = await loop.run_in_executor(
+                        executor, self._get_updates
+                    )
+                except error.TelegramError as e:
+                    homework.ERRORS.labels('commands', type(e).__name__).inc()
+                    delay = self.backoff.failure(UPSTREAM)
+                    logging.error(
+                        'Телеграм, getUpdates: %s, повтор через %.0fс', e,
+                        delay, extra={'delay': delay}
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                self.backoff.success(UPSTREAM)
+                for update in updates:
+                    message = update.message
+                    if message is not None and message.text:
+                        await loop.run_in_executor(
+                            executor, self.commands.prepare, message.text
+                        )
+                    self.dispatch(update)
+
+    def stop(self):
+        """Остановиться после текущего запроса getUpdates."""
+        self._running = False
+
+
+async def serve(engine, listener: CommandListener):
+    """Движок опроса и приём команд в одном цикле событий."""
+    task = asyncio.create_task(listener.run())
+    try:
+        await engine.run()
+    finally:
+        listener.stop()
+        await asyncio.wait({task}, timeout=listener.timeout + 5)
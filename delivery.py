@@ -0,0 +1,366 @@
+"""Асинхронная очередь отправки сообщений в Telegram."""
+import asyncio
+import itertools
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import error
+
+import homework
+import metrics
+from backoff import BACKOFF_MAX, BackoffScheduler
+from ratelimit import TokenBucket
+
+# Ограничения Telegram: ~30 сообщений в секунду всего и ~1 в секунду в чат
+TELEGRAM_RATE = float(os.getenv('TELEGRAM_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+DELIVERY_WORKERS = int(os.getenv('DELIVERY_WORKERS', 4))
+DELIVERY_ATTEMPTS = int(os.getenv('DELIVERY_ATTEMPTS', 5))
+RETRY_DELAY = 1.0
+UPSTREAM = 'telegram'
+# Сколько секунд копить несрочные сообщения чата в одну сводку; 0 — не копить
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 0))
+# Предел длины сообщения Telegram
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = '\n\n'
+
+SEND_SECONDS = metrics.histogram(
+    'telegram_send_seconds', 'Длительность отправки сообщения в Telegram'
+)
+SENT = metrics.counter('notifications_sent_total', 'Отправленные сообщения')
+DROPPED = metrics.counter(
+    'notifications_dropped_total', 'Сообщения, от которых пришлось отказаться'
+)
+COALESCED = metrics.counter(
+    'notifications_coalesced_total',
+    'Сообщения, отправленные в составе сводки с другими'
+)
+QUEUE_DEPTH = metrics.gauge(
+    'delivery_queue_depth', 'Сообщений в очереди на отправку'
+)
+
+
+class DeliveryQueue:
+    """
+    Очередь исходящих сообщений с обработчиками и ограничением частоты.
+
+    У каждого чата своя очередь сообщений и своё ведро токенов, а в
+    общую очередь ready попадают идентификаторы чатов, готовых к
+    отправке. Чат, упёршийся в лимит или ожидающий повтора, откладывается
+    через loop.call_later и не задерживает остальные чаты; порядок
+    сообщений внутри чата сохраняется. Повторы после ошибок
+    планируются по backoff.BackoffScheduler отдельно для каждого чата,
+    а сетевые ошибки размыкают общий выключатель 'telegram'.
+    С digest_window несрочные сообщения чата ждут до digest_window
+    секунд, и все накопленные сообщения чата уходят одной сводкой —
+    несколькими, если вместе они длиннее MESSAGE_LIMIT; срочное
+    сообщение забирает накопленные и отправляется сразу.
+    С журналом outbox.Outbox каждое сообщение записывается на диск
+    при постановке в очередь и вычёркивается после ответа Telegram.
+    Такие сообщения не отбрасываются из-за сетевых ошибок: повторы
+    продолжаются с паузой до BACKOFF_MAX, пока Telegram не станет
+    доступен. Не отправленные за attempts попыток из-за других ошибок
+    сообщения остаются в журнале и уходят после перезапуска.
+    У очереди свой пул потоков по числу обработчиков, поэтому отправка
+    не ждёт за запросами к API в пуле движка опроса.
+    """
+
+    def __init__(self, bot, send=None, workers: int = DELIVERY_WORKERS,
+                 rate: float = TELEGRAM_RATE,
+                 chat_rate: float = TELEGRAM_CHAT_RATE,
+                 attempts: int = DELIVERY_ATTEMPTS,
+                 retry_delay: float = RETRY_DELAY, backoff=None,
+                 outbox=None, digest_window: float = DIGEST_WINDOW,
+                 message_limit: int = MESSAGE_LIMIT):
+        self.bot = bot
+        self.outbox = outbox
+        self._restored = False
+        self.send = send or homework.send_to_chat
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.chat_rate = chat_rate
+        self.attempts = attempts
+        self.digest_window = digest_window
+        self.message_limit = message_limit
+        if backoff is None:
+            backoff = BackoffScheduler(base=retry_delay, max_delay=BACKOFF_MAX)
+        self.backoff = backoff
+        self.executor = None
+        self._chats = {}
+        self._buckets = {}
+        self._scheduled = set()
+        self._digests = {}
+        self._ready = None
+        self._tasks = []
+        self._unfinished = 0
+        self._idle = None
+
+    @property
+    def depth(self) -> int:
+        """Число сообщений, ожидающих отправки."""
+        return self._unfinished
+
+    def _init_loop_state(self):
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+            self._idle = asyncio.Event()
+            self._idle.set()
+
+    def put(self, chat_id, text: str, urgent: bool = True):
+        """
+        Поставить сообщение в очередь, не дожидаясь отправки.
+
+        :param chat_id: Идентификатор чата
+        :param text: Текст сообщения
+        :param urgent: Отправить сразу; иначе подождать digest_window
+            секунд и отправить вместе с другими сообщениями чата
+        """
+        key = None
+        if self.outbox is not None:
+            key = self.outbox.add(chat_id, text)
+        self._enqueue(chat_id, text, key, urgent)
+
+    def _enqueue(self, chat_id, text: str, key, urgent: bool = True):
+        self._init_loop_state()
+        self._chats.setdefault(chat_id, deque()).append([text, 0, key])
+        self._unfinished += 1
+        self._idle.clear()
+        if not self.digest_window:
+            self._wake(chat_id)
+        elif urgent:
+            timer = self._digests.pop(chat_id, None)
+            if timer is not None:
+                timer.cancel()
+            self._wake(chat_id)
+        elif chat_id not in self._scheduled and chat_id not in self._digests:
+            self._digests[chat_id] = asyncio.get_running_loop().call_later(
+                self.digest_window, self._digest_due, chat_id
+            )
+
+    def _digest_due(self, chat_id):
+        del self._digests[chat_id]
+        self._wake(chat_id)
+
+    def put_many(self, chat_ids, text: str, urgent: bool = True):
+        """
+        Разослать одно сообщение нескольким чатам.
+
+        Текст не копируется: все очереди чатов ссылаются на одну строку.
+        :param chat_ids: Идентификаторы чатов
+        :param text: Текст сообщения
+        :param urgent: См. put()
+        """
+        for chat_id in chat_ids:
+            self.put(chat_id, text, urgent)
+
+    async def commit(self):
+        """Дождаться записи поставленных сообщений в журнал на диске."""
+        if self.outbox is not None:
+            await self.outbox.commit()
+
+    def _wake(self, chat_id, delay: float = 0):
+        if chat_id in self._scheduled:
+            return
+        self._scheduled.add(chat_id)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(
+                delay, self._ready.put_nowait, chat_id
+            )
+        else:
+            self._ready.put_nowait(chat_id)
+
+    def _done(self):
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._idle.set()
+
+    def _retry_after(self, chat_id, exc, attempt: int,
+                     durable: bool = False):
+        """
+        Задержка перед повтором или None, если повторять не нужно.
+
+        Сообщение из журнала (durable) при сетевых ошибках повторяется
+        без ограничения числа попыток.
+        """
+        network = (isinstance(exc, error.NetworkError)
+                   and not isinstance(exc, error.BadRequest))
+        if network:
+            self.backoff.failure(UPSTREAM)
+        else:
+            # Telegram ответил — сервис доступен, даже если запрос отклонён
+            self.backoff.success(UPSTREAM)
+        if isinstance(exc, error.RetryAfter):
+            return exc.retry_after
+        if isinstance(exc, (error.Unauthorized, error.BadRequest)):
+            return None
+        if attempt >= self.attempts and not (durable and network):
+            self.backoff.success(chat_id)
+            return None
+        return self.backoff.failure(chat_id)
+
+    async def _deliver(self, chat_id):
+        self._scheduled.discard(chat_id)
+        messages = self._chats.get(chat_id)
+        if not messages:
+            return
+        wait = self.backoff.allow(UPSTREAM)
+        if wait:
+            self._wake(chat_id, wait)
+            return
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, 1)
+        wait = bucket.try_acquire()
+        if wait:
+            self._wake(chat_id, wait)
+            return
+        await asyncio.sleep(self.bucket.reserve())
+        batch = self._batch(messages)
+        entry = batch[0]
+        text = entry[0] if len(batch) == 1 else DIGEST_SEPARATOR.join(
+            item[0] for item in batch
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            with SEND_SECONDS.time():
+                await loop.run_in_executor(
+                    self.executor, self.send, self.bot, chat_id, text
+                )
+        except error.TelegramError as e:
+            homework.ERRORS.labels('send', type(e).__name__).inc()
+            entry[1] += 1
+            delay = self._retry_after(
+                chat_id, e, entry[1], entry[2] is not None
+            )
+            if delay is not None:
+                logging.warning(
+                    'Телеграм, чат %s: %s, повтор через %sс', chat_id, e,
+                    delay, extra={'chat': chat_id, 'delay': delay}
+                )
+                self._wake(chat_id, delay)
+                return
+            for item in batch:
+                self._give_up(chat_id, item, e)
+        else:
+            self._sent(chat_id, batch)
+        self._advance(chat_id, len(batch))
+
+    def _advance(self, chat_id, count: int):
+        """Убрать count отправленных сообщений и разбудить чат снова."""
+        messages = self._chats[chat_id]
+        for _ in range(count):
+            messages.popleft()
+            self._done()
+        if messages:
+            # Несрочные сообщения, пришедшие во время отправки, ждут сводки
+            if chat_id not in self._digests:
+                self._wake(chat_id)
+        else:
+            del self._chats[chat_id]
+            if self._buckets[chat_id].full:
+                del self._buckets[chat_id]
+
+    def _batch(self, messages) -> list:
+        """
+        Сообщения из начала очереди чата для одной отправки.
+
+        Без digest_window — одно сообщение. Иначе столько, сколько
+        помещается в message_limit вместе с разделителями; сообщения
+        не разрезаются, поэтому слишком длинное уходит отдельно.
+        """
+        batch = [messages[0]]
+        if not self.digest_window:
+            return batch
+        size = len(messages[0][0])
+        for entry in itertools.islice(messages, 1, None):
+            size += len(DIGEST_SEPARATOR) + len(entry[0])
+            if size > self.message_limit:
+                break
+            batch.append(entry)
+        return batch
+
+    def _sent(self, chat_id, batch: list):
+        SENT.inc()
+        COALESCED.inc(len(batch) - 1)
+        for entry in batch:
+            if entry[2] is not None:
+                self.outbox.ack(entry[2])
+        self.backoff.success(UPSTREAM)
+        self.backoff.success(chat_id)
+
+    def _give_up(self, chat_id, entry, exc):
+        DROPPED.inc()
+        # Неверный запрос и заблокировавший бота чат не примут сообщение
+        # и после перезапуска
+        if entry[2] is None or isinstance(
+            exc, (error.BadRequest, error.Unauthorized)
+        ):
+            if entry[2] is not None:
+                self.outbox.ack(entry[2])
+            logging.error(
+                'Телеграм, чат %s: сообщение потеряно: %s', chat_id, exc,
+                extra={'chat': chat_id}
+            )
+            return
+        logging.error(
+            'Телеграм, чат %s: %s, сообщение осталось в журнале до '
+            'перезапуска', chat_id, exc, extra={'chat': chat_id}
+        )
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            try:
+                await self._deliver(chat_id)
+            except Exception as e:
+                logging.critical(
+                    'Сбой очереди отправки, чат %s: %s', chat_id, e,
+                    extra={'chat': chat_id}
+                )
+
+    def start(self):
+        """Запустить обработчики очереди в текущем цикле событий."""
+        self._init_loop_state()
+        QUEUE_DEPTH.set_function(lambda: self.depth)
+        if self.outbox is not None and not self._restored:
+            import outbox
+
+            self._restored = True
+            outbox.PENDING.set_function(lambda: len(self.outbox))
+            for key, chat_id, text in self.outbox.pending():
+                self._enqueue(chat_id, text, key, urgent=False)
+        if not self._tasks:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='delivery'
+                )
+            self._tasks = [
+                asyncio.create_task(self._worker())
+                for _ in range(self.workers)
+            ]
+
+    async def join(self):
+        """Дождаться отправки (или отказа) всех сообщений очереди."""
+        self._init_loop_state()
+        await self._idle.wait()
+
+    def close(self):
+        """Сбросить на диск и закрыть журнал отправки."""
+        if self.outbox is not None:
+            self.outbox.close()
+
+    async def stop(self):
+        """Остановить обработчики."""
+        for timer in self._digests.values():
+            timer.cancel()
+        self._digests.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
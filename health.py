@@ -0,0 +1,152 @@
+"""Проверки живости и готовности: /health и /ready служебного сервера."""
+import json
+import os
+
+import admin
+import clock
+from backoff import OPEN
+
+# Цикл опроса не делал оборота дольше — процесс завис
+HEALTH_LOOP_STALE = float(os.getenv('HEALTH_LOOP_STALE', 120))
+# Опрос аккаунта идёт дольше — запрос завис
+HEALTH_POLL_TIMEOUT = float(os.getenv('HEALTH_POLL_TIMEOUT', 120))
+# Аккаунт должен был опрашиваться столько секунд назад, но не опрошен
+HEALTH_OVERDUE = float(os.getenv('HEALTH_OVERDUE', 300))
+# Очередь отправки длиннее — не готов
+HEALTH_MAX_QUEUE = int(os.getenv('HEALTH_MAX_QUEUE', 10000))
+# Сколько самых давно опрошенных аккаунтов показывать по умолчанию
+HEALTH_ACCOUNTS = 20
+
+_report = None
+
+
+def attach(report):
+    """
+    Источник состояния для /health и /ready.
+
+    report(limit) -> dict с ключами alive, ready и подробностями;
+    обычно functools.partial(engine_report, engine).
+    """
+    global _report
+    _report = report
+
+
+def _age(moment: float, now: float):
+    return round(now - moment, 1) if moment else None
+
+
+def engine_report(engine, limit: int = HEALTH_ACCOUNTS,
+                  now: float = None) -> dict:
+    """
+    Состояние poller.Poller без блокировок цикла опроса.
+
+    Читаются только копии словарей движка, поэтому вызов из потока
+    служебного сервера безопасен и ничего не ждёт.
+    :param engine: poller.Poller
+    :param limit: Сколько аккаунтов перечислить (самые давно опрошенные)
+    :return: dict: alive, ready, problems, accounts и т. д.
+    """
+    from poller import UPSTREAM
+
+    now = clock.time() if now is None else now
+    accounts = [a for a in list(engine.accounts.values()) if a.chats]
+    inflight = dict(engine.inflight)
+    hung = [key for key, started in inflight.items()
+            if now - started > HEALTH_POLL_TIMEOUT]
+    overdue = [
+        account.key for account in accounts
+        if account.key not in inflight
+        and now - account.next_poll > HEALTH_OVERDUE
+    ]
+    depth = engine.delivery.depth
+    problems = []
+    alive = bool(engine.heartbeat) and (
+        now - engine.heartbeat < HEALTH_LOOP_STALE
+    )
+    if not alive:
+        problems.append('цикл опроса не работает')
+    if hung:
+        problems.append(f'опросов дольше {HEALTH_POLL_TIMEOUT:.0f}с: '
+                        f'{len(hung)}')
+    if overdue:
+        problems.append(f'просрочено аккаунтов: {len(overdue)}')
+    if depth > HEALTH_MAX_QUEUE:
+        problems.append(f'очередь отправки: {depth}')
+    upstreams = {}
+    for name, scheduler in ((UPSTREAM, engine.backoff),
+                            ('telegram', engine.delivery.backoff)):
+        state = scheduler.get(name)
+        upstreams[name] = {
+            'circuit_open': state.state == OPEN,
+            'backoff': round(state.delay, 1),
+            'failures': state.failures,
+        }
+    accounts.sort(key=lambda account: account.last_success)
+    return {
+        'alive': alive,
+        'ready': not problems,
+        'problems': problems,
+        'heartbeat_age': _age(engine.heartbeat, now),
+        'queue_depth': depth,
+        'accounts_total': len(accounts),
+        'accounts_never_polled': sum(
+            1 for account in accounts if not account.last_success
+        ),
+        'upstreams': upstreams,
+        'accounts': [
+            {
+                'account': account.key,
+                'last_success_age': _age(account.last_success, now),
+                'next_poll_in': round(account.next_poll - now, 1),
+                'backoff': round(engine.backoff.get(account.key).delay, 1),
+                'polling': account.key in inflight,
+            }
+            for account in accounts[:limit]
+        ],
+    }
+
+
+def supervisor_report(supervisor, limit: int = HEALTH_ACCOUNTS) -> dict:
+    """
+    Состояние supervisor.Supervisor: живы ли все обработчики.
+
+    Обработчики — отдельные процессы, их движки отсюда не видны.
+    """
+    alive = {worker_id: process.is_alive()
+             for worker_id, process in list(supervisor.processes.items())}
+    running = sum(alive.values())
+    problems = []
+    if running < supervisor.size:
+        problems.append(f'обработчиков {running} из {supervisor.size}')
+    return {
+        'alive': running > 0,
+        'ready': not problems,
+        'problems': problems,
+        'workers': {str(key): value for key, value in alive.items()},
+    }
+
+
+def _view(key: str, params):
+    if _report is None:
+        return 503, 'application/json', json.dumps(
+            {key: False, 'problems': ['бот не запущен']}, ensure_ascii=False
+        )
+    try:
+        limit = int(params.get('limit', [HEALTH_ACCOUNTS])[0])
+    except ValueError:
+        limit = HEALTH_ACCOUNTS
+    report = _report(limit=limit)
+    status = 200 if report[key] else 503
+    return status, 'application/json', json.dumps(report, ensure_ascii=False)
+
+
+@admin.route('/health')
+def health_view(params):
+    """Живость: цикл опроса работает (503 — процесс пора перезапустить)."""
+    return _view('alive', params)
+
+
+@admin.route('/ready')
+def ready_view(params):
+    """Готовность: нет зависших и просроченных опросов, очередь в норме."""
+    return _view('ready', params)
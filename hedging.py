@@ -0,0 +1,143 @@
+"""Дублирующие запросы к медленному API и ограничение по времени."""
+import asyncio
+import os
+from collections import deque
+
+import clock
+import homework
+import metrics
+
+# Дубль запускается, если запрос идёт дольше этого перцентиля задержек
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))
+# Доля запросов, которые можно продублировать (0 — без дублей)
+HEDGE_RATE = float(os.getenv('HEDGE_RATE', 0.05))
+# Нижняя граница ожидания перед дублем, с
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 0.2))
+# Предельное время ответа с учётом дубля, с (0 — без предела)
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 0))
+# Сколько последних задержек учитывать и сколько нужно до первого дубля
+WINDOW_SIZE = 1000
+MIN_SAMPLES = 20
+# Сколько дублей может накопиться в запасе
+HEDGE_BURST = 10
+
+HEDGES = metrics.counter(
+    'practicum_hedged_requests_total',
+    'Дублирующие запросы к API: запущенные и выигравшие', ('outcome',)
+)
+DEADLINES = metrics.counter(
+    'practicum_deadline_exceeded_total',
+    'Запросы к API, не уложившиеся в REQUEST_DEADLINE'
+)
+
+
+class LatencyWindow:
+    """Последние size задержек успешных запросов."""
+
+    def __init__(self, size: int = WINDOW_SIZE):
+        self._values = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, seconds: float):
+        self._values.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """Перцентиль q (0–100) или 0.0, если замеров нет."""
+        if not self._values:
+            return 0.0
+        ordered = sorted(self._values)
+        index = min(len(ordered) - 1, int(len(ordered) * q / 100))
+        return ordered[index]
+
+
+class Hedger:
+    """
+    Дублирование медленных запросов (hedged requests).
+
+    Если ответ не пришёл за перцентиль percentile последних
+    задержек, запускается второй такой же запрос, и побеждает первый
+    успешный ответ. Проигравший запрос не прерывается (requests нельзя
+    отменить), его результат отбрасывается. Дубли ограничены долей
+    max_rate от всех запросов: каждый запрос добавляет в запас
+    max_rate дубля, каждый дубль тратит один. Если задан deadline,
+    запрос вместе с дублем не ждут дольше deadline секунд, а затем
+    выбрасывается homework.UpstreamError.
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE,
+                 max_rate: float = HEDGE_RATE,
+                 min_delay: float = HEDGE_MIN_DELAY,
+                 deadline: float = REQUEST_DEADLINE,
+                 min_samples: int = MIN_SAMPLES):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.deadline = deadline
+        self.min_samples = min_samples
+        self.window = LatencyWindow()
+        self._budget = 0.0
+
+    def hedge_delay(self):
+        """Через сколько секунд запускать дубль; None — без дубля."""
+        if not self.max_rate or len(self.window) < self.min_samples:
+            return None
+        return max(self.window.percentile(self.percentile), self.min_delay)
+
+    async def call(self, submit):
+        """
+        Выполнить запрос с возможным дублем.
+
+        :param submit: Функция без аргументов, возвращающая awaitable
+            одной попытки (например, loop.run_in_executor(...))
+        :return: Результат первой успешной попытки
+        """
+        started = clock.monotonic()
+        self._budget = min(self._budget + self.max_rate, HEDGE_BURST)
+        primary = asyncio.ensure_future(submit())
+        attempts = {primary: started}
+        hedge_at = self.hedge_delay()
+        if hedge_at is not None:
+            hedge_at += started
+        deadline = started + self.deadline if self.deadline else None
+        error = None
+        try:
+            while attempts:
+                moments = [m for m in (hedge_at, deadline) if m is not None]
+                timeout = (max(min(moments) - clock.monotonic(), 0)
+                           if moments else None)
+                done, _ = await asyncio.wait(
+                    attempts, timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    began = attempts.pop(attempt)
+                    if attempt.exception() is None:
+                        self.window.add(clock.monotonic() - began)
+                        if attempt is not primary:
+                            HEDGES.labels('won').inc()
+                        return attempt.result()
+                    error = error or attempt.exception()
+                now = clock.monotonic()
+                if deadline is not None and now >= deadline and attempts:
+                    DEADLINES.inc()
+                    raise homework.UpstreamError(
+                        f'Нет ответа practicum.yandex.ru за {self.deadline}с'
+                    )
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if attempts and self._budget >= 1:
+                        self._budget -= 1
+                        HEDGES.labels('launched').inc()
+                        attempts[asyncio.ensure_future(submit())] = now
+            raise error
+        finally:
+            for attempt in attempts:
+                # Исход брошенной попытки не нужен, но его нужно забрать
+                attempt.add_done_callback(_discard)
+
+
+def _discard(attempt):
+    if not attempt.cancelled():
+        attempt.exception()
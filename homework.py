@@ -1,27 +1,48 @@
 import json
 import logging
 import os
+import re
 import sys
-import time
 
-import requests
 from dotenv import load_dotenv
-from telegram import Bot, error
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s'
-)
+import logs
+import metrics
+import profiling
+import streaming
+
+# telegram, requests и asyncio импортируются там, где нужны: импорт
+# модуля и проверка --check не тянут их, и перезапуск быстрее
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv("PRACTICUM_TOKEN")
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+# JSON-файл с подписками [{"token": ..., "chat_ids": [...]}]
+ACCOUNTS_FILE = os.getenv('PRACTICUM_ACCOUNTS')
+# Сколько аккаунтов опрашивается одновременно
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', 32))
 time_sleep_error = 30  # Время ожидания после ошибки
 RETRY_TIME = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 
+# Числовые настройки, которые проверяет --check
+NUMERIC_SETTINGS = (
+    'POLL_CONCURRENCY', 'POLL_REVIEWING_TIME', 'POLL_IDLE_FACTOR',
+    'POLL_IDLE_MAX', 'POLL_RPS', 'STREAM_BACKFILL_AGE',
+    'HTTP_CONNECT_TIMEOUT', 'HTTP_READ_TIMEOUT', 'HTTP_POOL_SIZE',
+    'TELEGRAM_RATE', 'TELEGRAM_CHAT_RATE', 'DELIVERY_WORKERS',
+    'DELIVERY_ATTEMPTS', 'BACKOFF_BASE', 'BACKOFF_MAX', 'BACKOFF_JITTER',
+    'CIRCUIT_THRESHOLD', 'CIRCUIT_PROBE_TIMEOUT',
+    'ADMIN_PORT', 'WORKERS', 'WORKER_RESTART_DELAY',
+    'COMMANDS_POLL_TIMEOUT', 'SUBSCRIPTIONS_PER_CHAT',
+    'OUTBOX_FSYNC_INTERVAL', 'OUTBOX_COMPACT_MIN', 'PROFILE_ITERATIONS',
+    'PROFILE_INTERVAL', 'PROFILE_MAX_SECONDS', 'DIGEST_WINDOW',
+)
+# Формат токена, который проверяет telegram.Bot
+TELEGRAM_TOKEN_RE = re.compile(r'^\d+:[\w-]+$')
+
 HOMEWORK_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
@@ -30,6 +51,28 @@ HOMEWORK_STATUSES = {
 
 logging.debug('Бот запущен!')
 
+API_LATENCY = metrics.histogram(
+    'practicum_request_seconds', 'Длительность запроса к API Практикума'
+)
+ERRORS = metrics.counter(
+    'bot_errors_total', 'Ошибки по этапам и типам', ('stage', 'type')
+)
+metrics.gauge(
+    'bot_legacy_backoff_seconds',
+    'Текущая пауза timeout_and_logging (синхронная send_message)',
+    function=lambda: time_sleep_error
+)
+
+
+def setup_logging():
+    """
+    Настройка логирования при запуске бота, а не при импорте модуля.
+
+    Записи пишутся фоновым потоком через очередь (logs.setup),
+    формат и уровень — LOG_FORMAT и LOG_LEVEL.
+    """
+    logs.setup()
+
 
 class PracticumException(Exception):
     """Исключения бота."""
@@ -37,6 +80,12 @@ class PracticumException(Exception):
     pass
 
 
+class UpstreamError(PracticumException):
+    """API Практикума недоступно: сетевая ошибка или ответ 5xx."""
+
+    pass
+
+
 def check_tokens():
     """
     Проверка доступности переменных окружения.
@@ -64,8 +113,10 @@ def timeout_and_logging(message: str = None, level_error=logging.error):
     if message:
         level_error(message)  # Запись в лог
     global time_sleep_error
-    logging.debug(f'Timeout: {time_sleep_error}с')
-    time.sleep(time_sleep_error)
+    logging.debug('Timeout: %sс', time_sleep_error)
+    import clock
+
+    clock.sleep(time_sleep_error)
     time_sleep_error *= 2
     if time_sleep_error >= 51200:
         time_sleep_error = 30
@@ -74,6 +125,7 @@ def timeout_and_logging(message: str = None, level_error=logging.error):
         )
 
 
+@profiling.stage('parse_status')
 def parse_status(homework: dict) -> str:
     """
     Извлекает из информации о конкретной домашней работе статус этой работы.
@@ -84,7 +136,7 @@ def parse_status(homework: dict) -> str:
     :param homework: Задание
     :return: Результат выполнения домашней работы
     """
-    logging.debug(f"Парсим домашнее задание: {homework}")
+    logging.debug('Парсим домашнее задание: %s', homework)
     homework_name = homework['homework_name']
     homework_status = homework['status']
 
@@ -108,15 +160,46 @@ def get_api_answer(current_timestamp: int) -> list:
     :param current_timestamp: Время в формате timestamp
     :return: ответ API
     """
-    logging.info("Получение ответа от сервера")
+    return get_account_answer(PRACTICUM_TOKEN, current_timestamp)
+
+
+def _record(token: str, current_timestamp: int, status: int, body):
+    """
+    Дописать ответ в журнал PRACTICUM_RECORD (replay.Recorder).
+
+    body — текст или requests.Response; тело читается, только если
+    запись включена.
+    """
+    import replay
+
+    recorder = replay.get_recorder()
+    if recorder is not None:
+        if not isinstance(body, str):
+            body = body.text
+        recorder.write(token, current_timestamp, status, body)
+
+
+def _request_homework_statuses(token: str, current_timestamp: int,
+                               stream: bool = False):
+    """
+    Запрос к API с проверкой кода ответа.
+
+    :return: requests.Response с кодом 200
+    """
+    import requests
+    import transport
+
     try:
-        homework_statuses = requests.get(
-            ENDPOINT,
-            headers={'Authorization': f'OAuth {PRACTICUM_TOKEN}'},
-            params={'from_date': current_timestamp}
-        )
+        with API_LATENCY.time():
+            homework_statuses = transport.get_transport().get(
+                ENDPOINT,
+                headers={'Authorization': f'OAuth {token}'},
+                params={'from_date': current_timestamp},
+                **({'stream': True} if stream else {})
+            )
     except requests.exceptions.RequestException as e:
-        raise PracticumException(
+        _record(token, current_timestamp, 0, str(e))
+        raise UpstreamError(
             "При обработке вашего запроса возникла неоднозначная "
             f"исключительная ситуация: {e}"
         )
@@ -125,11 +208,37 @@ def get_api_answer(current_timestamp: int) -> list:
     except TypeError as e:
         raise PracticumException(f"Не корректный тип данных {e}")
 
+    if not stream:
+        _record(token, current_timestamp, homework_statuses.status_code,
+                homework_statuses)
+    elif homework_statuses.status_code != 200:
+        # Незакрытый потоковый ответ держит соединение пула, и с pool_block
+        # следующие запросы ждут его бесконечно. Короткое тело ошибки
+        # дочитывается до закрытия, чтобы его можно было залогировать.
+        homework_statuses.content
+        homework_statuses.close()
+    if homework_statuses.status_code >= 500:
+        raise UpstreamError(
+            f"Ошибка {homework_statuses.status_code} practicum.yandex.ru")
+
     if homework_statuses.status_code != 200:
-        logging.debug(homework_statuses.json())
+        logging.debug('Ответ API: %s', logs.Lazy(homework_statuses.json))
         raise PracticumException(
             f"Ошибка {homework_statuses.status_code} practicum.yandex.ru")
+    return homework_statuses
 
+
+@profiling.stage('get_api_answer')
+def get_account_answer(token: str, current_timestamp: int) -> dict:
+    """
+    Получение ответа API для произвольного токена Практикума.
+
+    :param token: OAuth-токен аккаунта
+    :param current_timestamp: Время в формате timestamp
+    :return: ответ API
+    """
+    logging.info("Получение ответа от сервера")
+    homework_statuses = _request_homework_statuses(token, current_timestamp)
     try:
         homework_statuses_json = homework_statuses.json()
     except json.JSONDecodeError:
@@ -140,6 +249,37 @@ def get_api_answer(current_timestamp: int) -> list:
     return homework_statuses_json
 
 
+@profiling.stage('get_api_answer')
+def stream_account_answer(token: str, current_timestamp: int):
+    """
+    Потоковое получение ответа API.
+
+    Тело ответа читается частями по мере обхода результата, поэтому
+    даже полная история домашних работ (from_date=0) не загружается
+    в память целиком.
+    :param token: OAuth-токен аккаунта
+    :param current_timestamp: Время в формате timestamp
+    :return: streaming.HomeworkStream — итератор по домашним работам
+    """
+    import requests
+
+    logging.info("Потоковое получение ответа от сервера")
+    response = _request_homework_statuses(
+        token, current_timestamp, stream=True
+    )
+
+    def chunks():
+        try:
+            yield from response.iter_content(streaming.CHUNK_SIZE)
+        except requests.exceptions.RequestException as e:
+            raise UpstreamError(f"Обрыв ответа practicum.yandex.ru: {e}")
+        finally:
+            response.close()
+
+    return streaming.HomeworkStream(chunks())
+
+
+@profiling.stage('check_response')
 def check_response(response: list) -> list:
     """
     Проверяет ответ API на корректность.
@@ -171,6 +311,7 @@ def check_response(response: list) -> list:
     return response['homeworks']
 
 
+@profiling.stage('send_message')
 def send_message(bot, message: str):
     """
     Отправка сообщения в телеграм.
@@ -179,8 +320,12 @@ def send_message(bot, message: str):
     :param message: Сообщение
     :return: Результат отправки сообщения
     """
-    log = message.replace('\n', '')
-    logging.info(f"Отправка сообщения в телеграм: {log}")
+    from telegram import error
+
+    logging.info(
+        'Отправка сообщения в телеграм: %s',
+        logs.Lazy(message.replace, '\n', '')
+    )
     try:
         return bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
     except error.Unauthorized:
@@ -194,54 +339,237 @@ def send_message(bot, message: str):
         timeout_and_logging(f'Ошибка работы с Телеграм: {e}')
 
 
+@profiling.stage('send_message')
+def send_to_chat(bot, chat_id, message: str):
+    """
+    Отправка сообщения в произвольный чат без ожидания после ошибки.
+
+    Ошибки Телеграма пробрасываются вызывающему коду.
+    :param bot: Экземпляр бота телеграм
+    :param chat_id: Идентификатор чата
+    :param message: Сообщение
+    :return: Результат отправки сообщения
+    """
+    logging.info(
+        'Отправка сообщения в чат %s: %s', chat_id,
+        logs.Lazy(message.replace, '\n', ''), extra={'chat': chat_id}
+    )
+    return bot.send_message(chat_id=chat_id, text=message)
+
+
+def load_registry(store):
+    """
+    Подписки из PRACTICUM_ACCOUNTS, переменных окружения и хранилища.
+
+    :param store: storage.StateStore
+    :return: subscriptions.SubscriptionRegistry
+    """
+    import subscriptions
+
+    registry = subscriptions.SubscriptionRegistry(store)
+    if ACCOUNTS_FILE:
+        registry.load_file(ACCOUNTS_FILE)
+    if check_tokens():
+        registry.add(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+    registry.load_store()
+    return registry
+
+
+def create_engine(accounts, store, shares: int = 1, outbox_file=None):
+    """
+    Бот Telegram и движок опроса для аккаунтов.
+
+    :param accounts: Аккаунты для опроса
+    :param store: storage.StateStore
+    :param shares: На сколько процессов делятся общие лимиты
+        (POLL_RPS, TELEGRAM_RATE)
+    :param outbox_file: Журнал отправки (по умолчанию OUTBOX_FILE,
+        пустая строка — без журнала)
+    :return: poller.Poller
+    """
+    import delivery
+    import outbox
+    import poller
+    from telegram import Bot
+    from telegram.utils.request import Request
+
+    # Обработчики очереди отправки работают параллельно, им нужно
+    # по соединению (по умолчанию у python-telegram-bot одно)
+    bot = Bot(
+        token=TELEGRAM_TOKEN,
+        request=Request(con_pool_size=delivery.DELIVERY_WORKERS + 4)
+    )
+    if outbox_file is None:
+        outbox_file = outbox.OUTBOX_FILE
+    queue = delivery.DeliveryQueue(
+        bot, rate=delivery.TELEGRAM_RATE / shares,
+        outbox=outbox.Outbox(outbox_file) if outbox_file else None
+    )
+    return poller.Poller(
+        accounts, bot, concurrency=POLL_CONCURRENCY, retry_time=RETRY_TIME,
+        store=store, delivery=queue, rps=poller.POLL_RPS / shares
+    )
+
+
 def main():
     """
     В ней описана основная логика работы программы.
     Все остальные функции должны запускаться из неё.
-    Последовательность действий должна быть примерно такой:
+    Токены из подписок (PRACTICUM_ACCOUNTS, переменные окружения,
+    хранилище) опрашиваются одновременно асинхронным движком
+    poller.Poller. Для каждого токена последовательность действий такая:
         Сделать запрос к API.
         Проверить ответ.
         Если есть обновления — получить статус работы из обновления и
-            отправить сообщение в Telegram.
-        Подождать некоторое время и сделать новый запрос.
+            отправить сообщение всем подписанным чатам.
+        Запланировать следующий запрос через RETRY_TIME.
     :return:
     """
-    if not check_tokens():
+    setup_logging()
+    if not TELEGRAM_TOKEN or not (check_tokens() or ACCOUNTS_FILE):
         logging.critical("Отсутствует переменная(-ные) окружения")
         return 0
-    bot = Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())  # начальное значение timestamp или 0
+    import asyncio
+    from functools import partial
+
+    import admin
+    import commands
+    import health
+    import storage
+
+    store = storage.StateStore()
+    registry = load_registry(store)
+    accounts = registry.accounts()
+    if not accounts:
+        logging.critical("Не задано ни одного аккаунта для опроса")
+        store.close()
+        return 0
+    engine = create_engine(accounts, store)
+    health.attach(partial(health.engine_report, engine))
+    profiling.install()
+    admin.start()
+    try:
+        if commands.TELEGRAM_COMMANDS:
+            listener = commands.CommandListener(
+                engine.delivery.bot,
+                commands.Commands(registry, engine, store),
+                engine.delivery
+            )
+            asyncio.run(commands.serve(engine, listener))
+        else:
+            asyncio.run(engine.run())
+    finally:
+        engine.delivery.close()
+        store.close()
+
+
+def supervise(workers: int):
+    """
+    Запуск нескольких процессов-обработчиков (supervisor.Supervisor).
+
+    Аккаунты делятся между процессами консистентным хэшированием,
+    общие лимиты запросов — поровну.
+    """
+    setup_logging()
+    if not TELEGRAM_TOKEN or not (check_tokens() or ACCOUNTS_FILE):
+        logging.critical("Отсутствует переменная(-ные) окружения")
+        return 0
+    from functools import partial
+
+    import admin
+    import health
+    import supervisor
 
-    while True:
+    boss = supervisor.Supervisor(workers)
+    health.attach(partial(health.supervisor_report, boss))
+    admin.start()
+    boss.run()
+    return 0
+
+
+def _is_number(value) -> bool:
+    """Не заданная или числовая настройка."""
+    if value is None:
+        return True
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def preflight() -> bool:
+    """
+    Проверка настроек без запуска бота: python homework.py --check.
+
+    Проверяются токены (check_tokens или файл подписок
+    PRACTICUM_ACCOUNTS), формат TELEGRAM_TOKEN, числовые настройки
+    и доступность каталога хранилища. Ни telegram, ни requests не
+    импортируются, в сеть запросов нет.
+    :return: True, если ошибок не найдено
+    """
+    import storage
+    import subscriptions
+
+    problems = []
+    if not TELEGRAM_TOKEN:
+        problems.append('Не задан TELEGRAM_TOKEN')
+    elif not TELEGRAM_TOKEN_RE.match(TELEGRAM_TOKEN):
+        problems.append('TELEGRAM_TOKEN не похож на токен бота')
+    if not (check_tokens() or ACCOUNTS_FILE):
+        problems.append(
+            'Нужны PRACTICUM_TOKEN и TELEGRAM_CHAT_ID или PRACTICUM_ACCOUNTS'
+        )
+    if ACCOUNTS_FILE:
         try:
-            response_api = get_api_answer(current_timestamp)
-            homeworks = check_response(response_api)
-            logging.info("Список домашних работ получен")
-            if ((type(homeworks) is list)
-                    and (len(homeworks) > 0)
-                    and homeworks):
-                send_message(bot, parse_status(homeworks[0]))
-            else:
-                logging.info("Задания не обнаружены")
-            current_timestamp = response_api['current_date']
-            time.sleep(RETRY_TIME)
-
-        except PracticumException as e:
-            # send_message(bot, f'Ошибка: practicum.yandex.ru: {e}')
-            timeout_and_logging(f'practicum.yandex.ru: {e}')
-        except Exception as e:
-            timeout_and_logging(
-                f'Сбой в работе программы: {e}',
-                logging.critical
-            )
+            tokens = {token for token, _ in
+                      subscriptions.read_file(ACCOUNTS_FILE)}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            problems.append(f'PRACTICUM_ACCOUNTS {ACCOUNTS_FILE}: {e!r}')
         else:
-            global time_sleep_error
-            time_sleep_error = 30
+            logging.info('PRACTICUM_ACCOUNTS: токенов %d', len(tokens))
+    problems.extend(
+        f'{name}={os.getenv(name)!r} не число'
+        for name in NUMERIC_SETTINGS if not _is_number(os.getenv(name))
+    )
+    directory = os.path.dirname(os.path.abspath(storage.STATE_DB))
+    if not os.access(directory, os.W_OK):
+        problems.append(f'Нет записи в каталог хранилища {directory}')
+    for problem in problems:
+        logging.critical(problem)
+    if not problems:
+        logging.info('Настройки в порядке')
+    return not problems
+
+
+def cli(argv=None):
+    """Разбор командной строки: без аргументов — запуск бота."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Бот статусов Практикума')
+    parser.add_argument(
+        '--check', action='store_true',
+        help='проверить настройки и выйти, не запуская бота'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help='число процессов-обработчиков (по умолчанию WORKERS или 1)'
+    )
+    args = parser.parse_args(argv)
+    if args.check:
+        setup_logging()
+        return 0 if preflight() else 1
+    import supervisor
+
+    workers = args.workers or supervisor.WORKERS
+    if workers > 1:
+        return supervise(workers)
+    return main()
 
 
 if __name__ == '__main__':
     try:
-        main()
+        sys.exit(cli())
     except KeyboardInterrupt:
         print('Выход из программы')
         sys.exit(0)
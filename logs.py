@@ -0,0 +1,116 @@
+"""Логирование через очередь в фоновом потоке, текстом или JSON."""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# text — как раньше, json — по объекту на строку
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+# Поля из extra=..., которые попадают в JSON-запись
+FIELDS = ('account', 'chat', 'latency', 'stage', 'delay')
+
+_listener = None
+
+
+class Lazy:
+    """
+    Значение для аргумента лога, вычисляемое только при выводе записи.
+
+    logging.debug('Ответ: %s', Lazy(response.json)) не разбирает
+    ответ, если DEBUG выключен.
+    """
+
+    __slots__ = ('function', 'args')
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def __str__(self):
+        return str(self.function(*self.args))
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной JSON-строкой с полями из FIELDS."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() подставляет аргументы в сообщение до
+    постановки в очередь, то есть в цикле опроса. Здесь запись уходит
+    в очередь как есть, и строка собирается в потоке QueueListener.
+    Аргументы должны спокойно переживать отложенный str(): в логах
+    бота это строки, числа, исключения и Account.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def formatter(kind: str = LOG_FORMAT) -> logging.Formatter:
+    """Форматтер для LOG_FORMAT: 'json' или текст."""
+    if kind == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def setup(level: str = LOG_LEVEL, kind: str = LOG_FORMAT,
+          stream=None) -> QueueListener:
+    """
+    Настроить корневой логгер: очередь и фоновый обработчик.
+
+    Повторный вызов возвращает уже запущенный QueueListener.
+    Прежние обработчики корневого логгера снимаются (как
+    basicConfig(force=True)): logging.debug() до настройки сам
+    добавляет обработчик, и записи выводились бы дважды.
+    При выходе из процесса очередь дописывается.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(formatter(kind))
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+        old.close()
+    root.setLevel(level)
+    root.addHandler(DeferredQueueHandler(records))
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop)
+    return _listener
+
+
+def stop():
+    """Остановить фоновый обработчик, дописав очередь."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in logging.getLogger().handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            logging.getLogger().removeHandler(handler)
+    _listener = None
@@ -0,0 +1,229 @@
+"""Метрики в текстовом формате Prometheus без внешних зависимостей."""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """
+    Базовая метрика с метками.
+
+    Значения для каждого набора меток хранятся в _values; изменение
+    и чтение защищены общей блокировкой, потому что /metrics
+    отдаётся из потока HTTP-сервера.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Дочерняя метрика для значений меток."""
+        return _Child(self, tuple(str(value) for value in values))
+
+    def _samples(self):
+        with self._lock:
+            return [
+                (f'{self.name}{_format_labels(self.label_names, key)}',
+                 value)
+                for key, value in self._values.items()
+            ]
+
+    def render(self) -> str:
+        """Метрика в текстовом формате экспозиции."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        lines.extend(f'{name} {value}' for name, value in self._samples())
+        return '\n'.join(lines)
+
+
+class _Child:
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount: float = 1):
+        self.metric._inc(self.key, amount)
+
+    def set(self, value: float):
+        self.metric._set(self.key, value)
+
+    def observe(self, value: float):
+        self.metric._observe(self.key, value)
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def inc(self, amount: float = 1):
+        """Увеличить счётчик без меток."""
+        self._inc((), amount)
+
+
+class Gauge(Metric):
+    """
+    Текущее значение.
+
+    Вместо set() можно передать function: тогда значение вычисляется
+    только при чтении /metrics и не стоит ничего в горячем цикле.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels=(),
+                 function=None):
+        super().__init__(name, documentation, labels)
+        self.function = function
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float):
+        """Установить значение без меток."""
+        self._set((), value)
+
+    def set_function(self, function):
+        """Вычислять значение при чтении: function() -> число или dict."""
+        self.function = function
+
+    def _samples(self):
+        if self.function is None:
+            return super()._samples()
+        value = self.function()
+        if not isinstance(value, dict):
+            return [(self.name, value)]
+        return [
+            (f'{self.name}{_format_labels(self.label_names, key)}', item)
+            for key, item in value.items()
+        ]
+
+
+class Histogram(Metric):
+    """Гистограмма с накопительными корзинами, суммой и количеством."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def observe(self, value: float):
+        """Учесть наблюдение без меток."""
+        self._observe((), value)
+
+    @contextmanager
+    def time(self, *labels):
+        """Измерить длительность блока with."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._observe(
+                tuple(str(label) for label in labels),
+                time.perf_counter() - started
+            )
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(counts), total, count)
+                     for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                labels = _format_labels(
+                    self.label_names, key, f'le="{bound}"'
+                )
+                samples.append((f'{self.name}_bucket{labels}', cumulative))
+            labels = _format_labels(self.label_names, key)
+            samples.append((f'{self.name}_sum{labels}', total))
+            samples.append((f'{self.name}_count{labels}', count))
+        return samples
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Зарегистрировать метрику (повторно — вернуть уже имеющуюся)."""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name: str):
+        """Метрика по имени или None."""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате экспозиции."""
+        return '\n'.join(
+            metric.render() for metric in self._metrics.values()
+        ) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labels=()) -> Counter:
+    """Счётчик в общем реестре."""
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels=(),
+          function=None) -> Gauge:
+    """Показатель в общем реестре."""
+    return REGISTRY.register(Gauge(name, documentation, labels, function))
+
+
+def histogram(name: str, documentation: str, labels=(),
+              buckets=DEFAULT_BUCKETS) -> Histogram:
+    """Гистограмма в общем реестре."""
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
@@ -0,0 +1,178 @@
+"""Журнал неотправленных сообщений на диске (outbox)."""
+import asyncio
+import json
+import logging
+import os
+
+import metrics
+import storage
+
+# Путь к журналу; пустая строка — без журнала (сообщения только в памяти)
+OUTBOX_FILE = os.getenv('OUTBOX_FILE', os.path.join(
+    os.path.dirname(os.path.abspath(storage.STATE_DB)), 'outbox.log'
+))
+# Сколько секунд копить записи перед общим fsync
+OUTBOX_FSYNC_INTERVAL = float(os.getenv('OUTBOX_FSYNC_INTERVAL', 0.05))
+# Журнал переписывается, когда в нём столько подтверждённых сообщений
+# и их больше, чем ожидающих
+OUTBOX_COMPACT_MIN = int(os.getenv('OUTBOX_COMPACT_MIN', 1000))
+
+PENDING = metrics.gauge(
+    'outbox_pending', 'Сообщений в журнале, ожидающих подтверждения отправки'
+)
+SYNCS = metrics.counter('outbox_fsync_total', 'Вызовы fsync журнала')
+
+
+def worker_path(path: str, worker_id) -> str:
+    """Свой журнал для каждого процесса-обработчика."""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}-{worker_id}{ext}'
+
+
+class Outbox:
+    """
+    Журнал сообщений, ещё не подтверждённых Telegram.
+
+    Каждое сообщение дописывается строкой ["a", id, chat_id, text]
+    до того, как движок сохранит курсор опроса, а подтверждение
+    отправки — строкой ["d", id]. commit() объединяет fsync всех
+    записей, сделанных за OUTBOX_FSYNC_INTERVAL, в один вызов в
+    отдельном потоке. После перезапуска pending() возвращает всё, что
+    не было подтверждено, — доставка «хотя бы один раз». Когда
+    подтверждённых записей становится много, журнал переписывается
+    только с ожидающими сообщениями. Все методы, кроме fsync,
+    вызываются из цикла событий.
+    """
+
+    def __init__(self, path: str = OUTBOX_FILE,
+                 fsync_interval: float = OUTBOX_FSYNC_INTERVAL,
+                 compact_min: int = OUTBOX_COMPACT_MIN):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.compact_min = compact_min
+        self._pending = {}
+        self._next_id = 1
+        self._acked = 0
+        # Номер последней записи add() и последней, уже сброшенной на диск
+        self._written = 0
+        self._flushed = 0
+        self._synced = 0
+        self._syncing = None
+        self._running = None
+        # fsync и переписывание журнала не идут одновременно
+        self._lock = None
+        self._recover()
+        self._compact()
+        if self._pending:
+            logging.warning('Неотправленных сообщений в %s: %d',
+                            path, len(self._pending))
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _recover(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Строка, оборванная при падении, — последняя
+                    break
+                if entry[0] == 'a':
+                    self._pending[entry[1]] = (entry[2], entry[3])
+                else:
+                    self._pending.pop(entry[1], None)
+                self._next_id = max(self._next_id, entry[1] + 1)
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _compact(self):
+        """Переписать журнал, оставив только ожидающие сообщения."""
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            for key, (chat_id, text) in self._pending.items():
+                file.write(json.dumps(['a', key, chat_id, text],
+                                      ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)),
+                            os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._acked = 0
+
+    def add(self, chat_id, text: str) -> int:
+        """
+        Записать сообщение в журнал (на диск — после commit()).
+
+        :return: Номер сообщения для ack()
+        """
+        key = self._next_id
+        self._next_id += 1
+        self._pending[key] = (chat_id, text)
+        self._write(['a', key, chat_id, text])
+        self._written += 1
+        return key
+
+    def ack(self, key: int):
+        """Отметить сообщение отправленным."""
+        if self._pending.pop(key, None) is None:
+            return
+        self._write(['d', key])
+        self._acked += 1
+
+    def pending(self) -> list:
+        """Неподтверждённые сообщения: список (id, chat_id, text)."""
+        return [(key, chat_id, text)
+                for key, (chat_id, text) in self._pending.items()]
+
+    async def commit(self):
+        """Дождаться, пока добавленные сообщения окажутся на диске."""
+        target = self._written
+        while self._synced < target:
+            if self._running is not None and self._flushed >= target:
+                # Записи уже сброшены идущим fsync — ждать его
+                waiter = self._running
+            else:
+                if self._syncing is None:
+                    self._syncing = asyncio.ensure_future(self._sync())
+                waiter = self._syncing
+            await asyncio.shield(waiter)
+
+    async def _sync(self):
+        await asyncio.sleep(self.fsync_interval)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Записи, сделанные после flush(), ждут следующего fsync
+            self._syncing = None
+            self._running = asyncio.current_task()
+            generation = self._flushed = self._written
+            try:
+                self._file.flush()
+                await asyncio.get_running_loop().run_in_executor(
+                    None, os.fsync, self._file.fileno()
+                )
+            finally:
+                self._running = None
+            self._synced = max(self._synced, generation)
+            SYNCS.inc()
+            if (self._acked >= self.compact_min
+                    and self._acked > len(self._pending)):
+                self._file.close()
+                self._compact()
+
+    def close(self):
+        """Сбросить журнал на диск и закрыть."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
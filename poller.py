@@ -0,0 +1,525 @@
+"""Асинхронный опрос множества аккаунтов Практикума из одного процесса."""
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import clock
+import hedging
+import homework
+import metrics
+import records
+import storage
+import tracker
+from backoff import CLOSED, BackoffScheduler
+from delivery import DeliveryQueue
+from ratelimit import TokenBucket
+
+UPSTREAM = 'practicum'
+# Интервал опроса, пока какая-то работа на проверке
+POLL_REVIEWING_TIME = float(os.getenv('POLL_REVIEWING_TIME', 120))
+# Рост интервала для аккаунтов без изменений и его предел
+POLL_IDLE_FACTOR = float(os.getenv('POLL_IDLE_FACTOR', 1.5))
+POLL_IDLE_MAX = float(os.getenv('POLL_IDLE_MAX', 3600))
+# Общий бюджет запросов к API в секунду на весь процесс
+POLL_RPS = float(os.getenv('POLL_RPS', 10))
+# Курсор старше этого (секунд) — догрузка истории потоковым разбором
+STREAM_BACKFILL_AGE = float(os.getenv('STREAM_BACKFILL_AGE', 7 * 86400))
+# Сколько работ держать между потоком ответа и обработкой
+STREAM_QUEUE_SIZE = 64
+# Как часто сохранять отправленные статусы при потоковой догрузке
+STREAM_FLUSH = 500
+# Последний элемент очереди потокового опроса
+STREAM_END = object()
+# Самое долгое ожидание цикла run(): heartbeat не должен устаревать
+IDLE_WAKEUP = 10
+
+POLL_SECONDS = metrics.histogram(
+    'poll_iteration_seconds', 'Длительность цикла опроса одного аккаунта'
+)
+TRANSITIONS = metrics.counter(
+    'status_transitions_total', 'Найденные изменения статусов'
+)
+SCHEDULED = metrics.gauge(
+    'accounts_scheduled', 'Аккаунтов в расписании опроса'
+)
+UPSTREAM_BACKOFF = metrics.gauge(
+    'upstream_backoff_seconds', 'Текущая пауза после ошибок сервиса',
+    ('upstream',)
+)
+UPSTREAM_CIRCUIT = metrics.gauge(
+    'upstream_circuit_open', 'Выключатель сервиса разомкнут (1) или нет',
+    ('upstream',)
+)
+ACCOUNTS_BACKING_OFF = metrics.gauge(
+    'accounts_backing_off', 'Аккаунтов и чатов с паузой после ошибок'
+)
+
+
+class Account:
+    """
+    Аккаунт Практикума и чаты, подписанные на его обновления.
+
+    key — идентификатор аккаунта в хранилище,
+    chats — множество идентификаторов чатов-подписчиков,
+    current_date — курсор from_date для следующего запроса,
+    next_poll — время (clock.time()) следующего опроса,
+    interval — текущий интервал опроса без изменений,
+    last_success — время последнего успешного опроса (0 — не было).
+    """
+
+    __slots__ = (
+        'token', 'key', 'chats', 'current_date', 'next_poll', 'interval',
+        'last_success'
+    )
+
+    def __init__(self, token: str, chats=(), current_date: int = None):
+        self.token = token
+        self.key = storage.account_key(token)
+        self.chats = set(chats)
+        if current_date is None:
+            current_date = int(clock.time())
+        self.current_date = current_date
+        self.next_poll = 0.0
+        self.interval = 0.0
+        self.last_success = 0.0
+
+    def __repr__(self):
+        return f'Account({self.key}, chats={len(self.chats)})'
+
+
+class AdaptiveInterval:
+    """
+    Интервал следующего опроса по статусам домашних работ.
+
+    Пока работа на проверке (reviewing), вердикт ожидается скоро, и
+    аккаунт опрашивается каждые reviewing секунд. Аккаунт без
+    изменений опрашивается всё реже: интервал растёт в factor раз от
+    base до max_interval и сбрасывается при любом изменении статуса.
+    """
+
+    def __init__(self, base: float = homework.RETRY_TIME,
+                 reviewing: float = POLL_REVIEWING_TIME,
+                 factor: float = POLL_IDLE_FACTOR,
+                 max_interval: float = POLL_IDLE_MAX):
+        self.base = base
+        self.reviewing = reviewing
+        self.factor = factor
+        self.max_interval = max(max_interval, base)
+
+    def next(self, account: Account, changed: bool,
+             reviewing: bool) -> float:
+        """
+        Интервал до следующего опроса после успешного опроса.
+
+        :param account: Аккаунт
+        :param changed: В этом опросе были изменения статусов
+        :param reviewing: Есть работы на проверке
+        :return: Интервал в секундах
+        """
+        if reviewing or changed or not account.interval:
+            account.interval = self.base
+        else:
+            account.interval = min(
+                account.interval * self.factor, self.max_interval
+            )
+        if reviewing:
+            return min(self.reviewing, account.interval)
+        return account.interval
+
+
+class Poller:
+    """
+    Движок опроса аккаунтов на asyncio.
+
+    Расписание хранится в куче (next_poll, seq, account), поэтому
+    память растёт линейно от числа аккаунтов, а одновременно
+    выполняется не больше concurrency запросов. Блокирующие вызовы
+    requests выполняются в общем пуле потоков того же размера,
+    отдельного потока на аккаунт нет. Сообщения не отправляются из
+    цикла опроса, а ставятся в очередь delivery.DeliveryQueue.
+    Паузы после ошибок считаются отдельно для каждого аккаунта, а
+    недоступность самого API (UpstreamError) размыкает общий
+    выключатель 'practicum', и до пробной попытки аккаунты не
+    опрашиваются.
+    Уведомления отправляются только о реальных изменениях статусов
+    (tracker.StatusIndex). Если передано хранилище store, курсоры и
+    снимок статусов восстанавливаются из него при старте.
+    Интервал опроса выбирает AdaptiveInterval, а общий темп запросов
+    к API ограничен бюджетом rps для всего процесса. Каждый токен
+    запрашивается один раз. Работы из ответа сразу превращаются в
+    компактные records.Homework, и дальше по конвейеру (индекс,
+    уведомления) словари API не передаются, а сообщение формируется
+    один раз и рассылается всем чатам-подписчикам аккаунта.
+    Если курсор старше STREAM_BACKFILL_AGE (например, from_date=0 у
+    нового аккаунта), ответ разбирается потоково: работы по одной
+    передаются из потока чтения через ограниченную очередь, так что
+    память не зависит от длины истории.
+    Обычный запрос, не ответивший за перцентиль задержек, дублируется
+    (hedging.Hedger) в пределах доли HEDGE_RATE запросов.
+    """
+
+    def __init__(self, accounts, bot, concurrency: int = 32,
+                 retry_time: int = homework.RETRY_TIME,
+                 fetch=None, send=None, store=None, delivery=None,
+                 backoff=None, rps: float = POLL_RPS,
+                 stream=None, hedger=None):
+        self.store = store
+        if delivery is None:
+            delivery = DeliveryQueue(bot, send=send)
+        self.delivery = delivery
+        self.interval = AdaptiveInterval(base=retry_time)
+        self.budget = TokenBucket(rps, 1)
+        self.backoff = BackoffScheduler() if backoff is None else backoff
+        self.concurrency = concurrency
+        self.fetch = fetch or homework.get_account_answer
+        self.stream = stream or homework.stream_account_answer
+        self.hedger = hedging.Hedger() if hedger is None else hedger
+        self._queue = []
+        self._seq = 0
+        self._running = False
+        self._wakeup = None
+        self._executor = None
+        self._dropped = set()
+        # {account.key: время начала опроса}
+        self.inflight = {}
+        # Аккаунты в расписании и время последнего оборота цикла run()
+        self.accounts = {}
+        self.heartbeat = 0.0
+        cursors = store.load_cursors() if store else {}
+        self.index = tracker.StatusIndex(
+            store.load_statuses() if store else ()
+        )
+        for account in accounts:
+            if account.key in cursors:
+                account.current_date = cursors[account.key]
+            self.schedule(account, 0)
+
+    def _register_metrics(self):
+        schedulers = {
+            UPSTREAM: self.backoff,
+            'telegram': self.delivery.backoff,
+        }
+        SCHEDULED.set_function(lambda: len(self._queue))
+        UPSTREAM_BACKOFF.set_function(lambda: {
+            (name,): scheduler.get(name).delay
+            for name, scheduler in schedulers.items()
+        })
+        UPSTREAM_CIRCUIT.set_function(lambda: {
+            (name,): int(scheduler.get(name).state != CLOSED)
+            for name, scheduler in schedulers.items()
+        })
+        ACCOUNTS_BACKING_OFF.set_function(
+            lambda: sum(len(s) for s in set(schedulers.values()))
+        )
+
+    def add(self, account: Account):
+        """
+        Добавить аккаунт в расписание работающего движка.
+
+        Курсор и снимок статусов аккаунта перечитываются из хранилища:
+        до этого его мог опрашивать другой процесс.
+        """
+        self._dropped.discard(account.key)
+        if self.store:
+            cursor = self.store.load_cursor(account.key)
+            if cursor is not None:
+                account.current_date = cursor
+            self.index.reset(
+                account.key, self.store.load_statuses(account.key)
+            )
+        self.schedule(account, 0)
+
+    def drop(self, account: Account):
+        """
+        Убрать аккаунт из расписания.
+
+        Начатый опрос доводится до конца; пока ключ в inflight,
+        аккаунт ещё опрашивается.
+        """
+        self._dropped.add(account.key)
+        self.accounts.pop(account.key, None)
+
+    def _is_stale(self, entry) -> bool:
+        """Запись кучи устарела: аккаунт убран или перепланирован."""
+        next_poll, _, account = entry
+        return (not account.chats or account.key in self._dropped
+                or next_poll != account.next_poll)
+
+    def schedule(self, account: Account, delay: float):
+        """Поставить аккаунт в расписание через delay секунд."""
+        account.next_poll = clock.time() + delay
+        self.accounts[account.key] = account
+        self._seq += 1
+        heapq.heappush(self._queue, (account.next_poll, self._seq, account))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _idle(self, timeout: float):
+        """Ждать timeout секунд или до нового элемента расписания."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _load(self, token: str, current_date: int):
+        """
+        Запрос и разбор ответа в потоке пула.
+
+        Дальше передаются только курсор и компактные записи, сам ответ
+        со всеми полями сразу отбрасывается.
+        :return: (current_date, [records.Homework])
+        """
+        response = self.fetch(token, current_date)
+        homeworks = records.from_api(homework.check_response(response))
+        return response['current_date'], homeworks
+
+    async def _fetch(self, token: str, current_date: int):
+        loop = asyncio.get_running_loop()
+        return await self.hedger.call(
+            lambda: loop.run_in_executor(
+                self._executor, self._load, token, current_date
+            )
+        )
+
+    async def poll(self, account: Account) -> float:
+        """
+        Один цикл опроса аккаунта.
+
+        :param account: Аккаунт
+        :return: Задержка до следующего опроса
+        """
+        wait = self.backoff.allow(UPSTREAM)
+        if wait:
+            return wait
+        started = time.perf_counter()
+        with POLL_SECONDS.time():
+            delay = await self._poll(account)
+        logging.debug(
+            'Опрос %s, следующий через %.0fс', account, delay,
+            extra={'account': account.key, 'delay': delay,
+                   'latency': round(time.perf_counter() - started, 4)}
+        )
+        return delay
+
+    def _notify(self, account: Account, item: records.Homework,
+                notified: list, urgent: bool = True):
+        message = homework.parse_status(item)
+        self.delivery.put_many(account.chats, message, urgent)
+        self.index.update(account.key, item)
+        TRANSITIONS.inc()
+        notified.append((item.name, item.status, item.updated))
+
+    def _produce(self, loop, queue: asyncio.Queue, stop: threading.Event,
+                 token: str, cursor: int):
+        """
+        Чтение потокового ответа в потоке пула.
+
+        Работы по одной кладутся в очередь, последним элементом —
+        (STREAM_END, сводка ответа или исключение).
+        """
+        try:
+            stream = self.stream(token, cursor)
+            for item in stream:
+                if stop.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(
+                    queue.put(records.Homework.from_api(item)), loop
+                ).result()
+            result = stream.summary()
+        except ValueError:
+            result = homework.PracticumException(
+                "Ответ от сервера должен быть в формате JSON"
+            )
+        except Exception as e:
+            result = e
+        asyncio.run_coroutine_threadsafe(
+            queue.put((STREAM_END, result)), loop
+        ).result()
+
+    async def _consume(self, account: Account, cursor: int,
+                       queue: asyncio.Queue, stop: threading.Event,
+                       notified: list) -> tuple:
+        """
+        Обработка работ из очереди потокового опроса.
+
+        После ошибки обработки поток чтения останавливается, а очередь
+        дочитывается до конца, чтобы не заблокировать его.
+        :return: (число изменений, сводка ответа или исключение)
+        """
+        changed = 0
+        failure = None
+        while True:
+            item = await queue.get()
+            if isinstance(item, tuple) and item[0] is STREAM_END:
+                return changed, failure or item[1]
+            if failure is not None:
+                continue
+            try:
+                if self.index.is_transition(account.key, item):
+                    # Догрузка после простоя — пачка изменений, в сводку
+                    self._notify(account, item, notified, urgent=False)
+                    changed += 1
+                if self.store and len(notified) >= STREAM_FLUSH:
+                    await self.delivery.commit()
+                    self.store.save_poll(account.key, cursor, notified)
+                    notified.clear()
+            except Exception as e:
+                failure = e
+                stop.set()
+
+    async def _poll_stream(self, account: Account, notified: list) -> int:
+        """
+        Потоковый опрос: работы обрабатываются по мере чтения ответа.
+
+        :return: Число найденных изменений
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+        cursor = account.current_date
+        producer = loop.run_in_executor(
+            self._executor, self._produce, loop, queue, stop,
+            account.token, cursor
+        )
+        changed, result = await self._consume(
+            account, cursor, queue, stop, notified
+        )
+        await producer
+        if isinstance(result, Exception):
+            raise result
+        homework.check_response(result)
+        account.current_date = result['current_date']
+        return changed
+
+    async def _poll(self, account: Account) -> float:
+        notified = []
+        cursor = account.current_date
+        try:
+            if clock.time() - cursor > STREAM_BACKFILL_AGE:
+                changed = await self._poll_stream(account, notified)
+            else:
+                current_date, homeworks = await self._fetch(
+                    account.token, cursor
+                )
+                transitions = self.index.diff(account.key, homeworks)
+                # Одно изменение уходит сразу, несколько — сводкой
+                urgent = len(transitions) == 1
+                for item in transitions:
+                    self._notify(account, item, notified, urgent)
+                changed = len(transitions)
+                account.current_date = current_date
+        except homework.UpstreamError as e:
+            homework.ERRORS.labels('poll', type(e).__name__).inc()
+            logging.error('practicum.yandex.ru %s: %s', account, e,
+                          extra={'account': account.key, 'stage': 'poll'})
+            self.backoff.failure(UPSTREAM)
+            return self.backoff.failure(account.key)
+        except homework.PracticumException as e:
+            homework.ERRORS.labels('poll', type(e).__name__).inc()
+            logging.error('practicum.yandex.ru %s: %s', account, e,
+                          extra={'account': account.key, 'stage': 'poll'})
+            self.backoff.success(UPSTREAM)
+            return self.backoff.failure(account.key)
+        except Exception as e:
+            homework.ERRORS.labels('poll', type(e).__name__).inc()
+            logging.critical(
+                'Сбой в работе программы %s: %s', account, e,
+                extra={'account': account.key, 'stage': 'poll'}
+            )
+            # Сбой в разборе ответа, а не в сервисе: пробная попытка
+            # выключателя не должна остаться без результата
+            self.backoff.success(UPSTREAM)
+            return self.backoff.failure(account.key)
+        finally:
+            # Поставленные в очередь статусы сохраняются и при ошибке,
+            # но только после записи сообщений в журнал отправки
+            if notified:
+                await self.delivery.commit()
+            if self.store and (notified or account.current_date != cursor):
+                self.store.save_poll(
+                    account.key, account.current_date, notified
+                )
+        self.backoff.success(UPSTREAM)
+        self.backoff.success(account.key)
+        account.last_success = clock.time()
+        return self.interval.next(
+            account, bool(changed),
+            self.index.has_status(account.key, 'reviewing')
+        )
+
+    async def _poll_and_reschedule(self, account, semaphore):
+        self.inflight[account.key] = clock.time()
+        try:
+            delay = await self.poll(account)
+        except Exception as e:
+            # Например, database is locked при сохранении курсора: без
+            # повторного планирования аккаунт выпал бы из расписания
+            homework.ERRORS.labels('poll', type(e).__name__).inc()
+            logging.error(
+                'Опрос %s не завершён: %s', account, e,
+                extra={'account': account.key, 'stage': 'poll'}
+            )
+            delay = self.backoff.failure(account.key)
+        finally:
+            self.inflight.pop(account.key, None)
+            semaphore.release()
+        if account.key in self._dropped:
+            return
+        if account.chats:
+            self.schedule(account, delay)
+        else:
+            self.accounts.pop(account.key, None)
+            logging.info('%s: подписчиков нет, опрос прекращён', account,
+                         extra={'account': account.key})
+
+    async def run(self):
+        """Основной цикл: запускает опросы по расписанию до stop()."""
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._register_metrics()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            self._executor = executor
+            self.delivery.start()
+            while self._running:
+                self.heartbeat = clock.time()
+                if not self._queue:
+                    await self._idle(IDLE_WAKEUP)
+                    continue
+                if self._is_stale(self._queue[0]):
+                    heapq.heappop(self._queue)
+                    continue
+                due = self._queue[0][0] - clock.time()
+                if due > 0:
+                    await self._idle(min(due, IDLE_WAKEUP))
+                    continue
+                wait = self.budget.try_acquire()
+                if wait:
+                    await asyncio.sleep(wait)
+                    continue
+                await semaphore.acquire()
+                entry = heapq.heappop(self._queue)
+                account = entry[2]
+                if self._is_stale(entry):
+                    semaphore.release()
+                    continue
+                task = asyncio.create_task(
+                    self._poll_and_reschedule(account, semaphore)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await self.delivery.stop()
+
+    def stop(self):
+        """Остановить основной цикл после текущих опросов."""
+        self._running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
@@ -0,0 +1,333 @@
+"""
+Профилирование работающего бота по запросу.
+
+Этапы get_api_answer, check_response, parse_status и send_message
+обёрнуты в stage(): пока профилирование выключено, обёртка только
+проверяет глобальную переменную. start() (сигнал SIGUSR2 или
+/profile/start служебного сервера) включает запись длительностей
+этапов и фоновый поток, который с интервалом PROFILE_INTERVAL снимает
+стеки всех потоков. Через PROFILE_ITERATIONS ответов API (или
+PROFILE_MAX_SECONDS секунд, или по stop()) в PROFILE_DIR пишутся
+profile-<время>.folded — стеки в формате flamegraph.pl/speedscope —
+и profile-<время>.json с длительностями этапов.
+"""
+import functools
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# По умолчанию — каталог profiles рядом с STATE_DB
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+PROFILE_ITERATIONS = int(os.getenv('PROFILE_ITERATIONS', 1000))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+# Профилирование выключается само, даже если ответов API не было
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 600))
+PROFILE_SIGNAL = getattr(signal, 'SIGUSR2', None)
+# Этап, вызовы которого считаются итерациями
+ITERATION_STAGE = 'get_api_answer'
+# Верхние кадры потока, который ждёт работы, а не выполняет её
+IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+_session = None
+_last = None
+_lock = threading.Lock()
+
+
+def stage(name: str):
+    """
+    Декоратор этапа: время вызова попадает в текущую сессию.
+
+    :param name: Имя этапа в отчёте
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            session = _session
+            if session is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                session.record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def _percentile(ordered: list, share: float) -> float:
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def _fold(frame) -> list:
+    """Кадры стека от корня к вершине в виде «функция (файл)»."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f'{code.co_name} ({os.path.basename(code.co_filename)})'
+        )
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class Session:
+    """
+    Одна сессия профилирования: стеки, длительности этапов, итерации.
+
+    Стеки снимаются фоновым потоком через sys._current_frames(); потоки,
+    ждущие работы (IDLE_FRAMES), не учитываются — в профиль попадает
+    то, на что уходит время, включая ожидание ответа сети.
+    """
+
+    def __init__(self, iterations: int, interval: float, duration: float,
+                 directory: str):
+        self.iterations = iterations
+        self.interval = interval
+        self.duration = duration
+        # pid различает профили обработчиков в режиме --workers
+        self.path = os.path.join(directory, time.strftime(
+            'profile-%Y%m%d-%H%M%S', time.localtime()
+        ) + f'-{os.getpid()}')
+        self.samples = 0
+        self.stacks = Counter()
+        self.timings = defaultdict(list)
+        self.started = time.monotonic()
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='profiler', daemon=True
+        )
+
+    @property
+    def done(self) -> int:
+        """Сколько итераций уже профилировано."""
+        return len(self.timings.get(ITERATION_STAGE, ()))
+
+    def record(self, name: str, seconds: float):
+        # Вызывается из разных потоков: append атомарен, счётчик — нет
+        values = self.timings[name]
+        values.append(seconds)
+        if name == ITERATION_STAGE and len(values) >= self.iterations:
+            self._stop.set()
+
+    def sample(self):
+        """Снять стеки всех потоков, кроме своего и ждущих."""
+        names = {thread.ident: thread.name
+                 for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            code = frame.f_code
+            if ident == own or (
+                os.path.basename(code.co_filename), code.co_name
+            ) in IDLE_FRAMES:
+                continue
+            stack = [names.get(ident, str(ident))] + _fold(frame)
+            self.stacks[';'.join(stack)] += 1
+        self.samples += 1
+
+    def begin(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        global _session, _last
+        deadline = self.started + self.duration
+        try:
+            while not self._stop.wait(self.interval):
+                self.sample()
+                if time.monotonic() >= deadline:
+                    break
+        finally:
+            with _lock:
+                if _session is self:
+                    _session = None
+            try:
+                _last = self.dump()
+            except OSError as e:
+                logging.error('Профиль не записан в %s: %s', self.path, e)
+                _last = dict(self.summary(), error=str(e))
+            self.finished.set()
+
+    def summary(self) -> dict:
+        """Итерации, число замеров и длительности этапов в миллисекундах."""
+        stages = {}
+        for name, values in list(self.timings.items()):
+            ordered = sorted(values)
+            stages[name] = {
+                'count': len(ordered),
+                'total_ms': round(sum(ordered) * 1000, 3),
+                'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+                'p50_ms': round(_percentile(ordered, 0.5) * 1000, 3),
+                'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3),
+            }
+        return {
+            'active': not self.finished.is_set(),
+            'iterations': self.done,
+            'iterations_limit': self.iterations,
+            'seconds': round(time.monotonic() - self.started, 3),
+            'interval': self.interval,
+            'samples': self.samples,
+            'stages': stages,
+        }
+
+    def dump(self) -> dict:
+        """Записать .folded и .json; вернуть сводку с путями файлов."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        summary = self.summary()
+        summary.update(active=False, folded=f'{self.path}.folded',
+                       report=f'{self.path}.json')
+        with open(summary['folded'], 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+        with open(summary['report'], 'w', encoding='utf-8') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+        logging.warning(
+            'Профиль записан: %s (итераций %d, замеров %d)',
+            summary['folded'], self.done, self.samples
+        )
+        return summary
+
+
+def _directory() -> str:
+    if PROFILE_DIR:
+        return PROFILE_DIR
+    import storage
+
+    return os.path.join(
+        os.path.dirname(os.path.abspath(storage.STATE_DB)), 'profiles'
+    )
+
+
+def start(iterations: int = PROFILE_ITERATIONS,
+          interval: float = PROFILE_INTERVAL,
+          duration: float = PROFILE_MAX_SECONDS,
+          directory: str = None) -> Session:
+    """
+    Включить профилирование.
+
+    :param iterations: Сколько ответов API профилировать
+    :param interval: Интервал снятия стеков, секунд
+    :param duration: Через сколько секунд остановиться в любом случае
+    :param directory: Каталог для профиля (по умолчанию PROFILE_DIR)
+    :return: Новая сессия
+    :raises RuntimeError: Профилирование уже включено
+    """
+    global _session
+    if iterations < 1 or interval <= 0 or duration <= 0:
+        raise ValueError(
+            'Число итераций, интервал и длительность профилирования '
+            'должны быть положительными'
+        )
+    with _lock:
+        if _session is not None:
+            raise RuntimeError('Профилирование уже включено')
+        session = Session(iterations, interval, duration,
+                          directory or _directory())
+        _session = session
+    session.begin()
+    logging.warning(
+        'Профилирование включено: %d итераций, интервал %s с',
+        iterations, interval
+    )
+    return session
+
+
+def stop(wait: bool = True):
+    """
+    Остановить профилирование и записать профиль.
+
+    :param wait: Дождаться записи файлов
+    :return: Сводка сессии или None, если профилирование не включено
+    """
+    session = _session
+    if session is None:
+        return None
+    session.stop()
+    if not wait:
+        return None
+    session.finished.wait()
+    return _last
+
+
+def status() -> dict:
+    """Сводка текущей сессии или последней завершённой."""
+    session = _session
+    if session is not None:
+        return session.summary()
+    return _last or {'active': False}
+
+
+def _on_signal(signum, frame):
+    # Обработчик сигнала не ждёт записи файлов: это делает поток сессии
+    if _session is not None:
+        stop(wait=False)
+    else:
+        try:
+            start()
+        except (ValueError, RuntimeError, OSError) as e:
+            logging.error('Профилирование не включено: %s', e)
+
+
+def _number(params: dict, name: str, default, kind=float):
+    try:
+        return kind(params.get(name, [default])[0])
+    except ValueError:
+        raise ValueError(f'{name} должно быть числом')
+
+
+def start_view(params):
+    """Включить профилирование: ?iterations=N&interval=S&duration=S."""
+    try:
+        session = start(
+            _number(params, 'iterations', PROFILE_ITERATIONS, int),
+            _number(params, 'interval', PROFILE_INTERVAL),
+            _number(params, 'duration', PROFILE_MAX_SECONDS),
+        )
+    except (ValueError, RuntimeError) as e:
+        return 409, 'application/json', json.dumps(
+            {'error': str(e)}, ensure_ascii=False
+        )
+    return 202, 'application/json', json.dumps(session.summary())
+
+
+def stop_view(params):
+    """Остановить профилирование и вернуть сводку с путями файлов."""
+    return 200, 'application/json', json.dumps(
+        stop() or status(), ensure_ascii=False
+    )
+
+
+def status_view(params):
+    """Сводка текущего или последнего профилирования."""
+    return 200, 'application/json', json.dumps(status(), ensure_ascii=False)
+
+
+def install(signum=PROFILE_SIGNAL):
+    """
+    Включать профилирование сигналом и через служебный сервер.
+
+    Сигнал переключает профилирование: первый включает, второй
+    останавливает досрочно. Вызывается из главного потока.
+    """
+    import admin
+
+    admin.route('/profile')(status_view)
+    admin.route('/profile/start')(start_view)
+    admin.route('/profile/stop')(stop_view)
+    if signum is not None:
+        signal.signal(signum, _on_signal)
@@ -0,0 +1,61 @@
+"""Ограничение частоты запросов алгоритмом token bucket."""
+import clock
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше capacity.
+
+    Не блокирует: reserve() сразу возвращает, сколько секунд
+    осталось ждать, а вызывающий код сам решает — подождать
+    или заняться другой работой.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = clock.monotonic()
+
+    def _refill(self):
+        now = clock.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до появления токена (не расходует его)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """
+        Взять токен, если он есть.
+
+        :return: 0, если токен взят, иначе время ожидания в секундах
+        """
+        wait = self.delay()
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+    def reserve(self) -> float:
+        """
+        Забронировать токен, даже если его ещё нет.
+
+        :return: Через сколько секунд можно выполнять запрос
+        """
+        wait = self.delay()
+        self.tokens -= 1
+        return wait
+
+    @property
+    def full(self) -> bool:
+        """Ведро полностью восстановилось (давно не использовалось)."""
+        self._refill()
+        return self.tokens >= self.capacity
@@ -0,0 +1,98 @@
+"""Компактные записи о домашних работах вместо словарей из ответа API."""
+import sys
+from datetime import datetime, timezone
+
+
+def to_timestamp(value):
+    """
+    Дата проверки в секундах Unix.
+
+    Принимает строку API ('2020-02-13T14:40:57Z'), число, строку
+    с числом (так колонка TEXT старых баз возвращает секунды) или None.
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if not isinstance(value, str):
+        return None
+    if value.isdigit():
+        return int(value)
+    # fromisoformat понимает суффикс Z только с Python 3.11
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+class Homework:
+    """
+    Домашняя работа: только то, что нужно боту.
+
+    Словарь из ответа API несёт все поля (комментарий ревьюера,
+    название урока, даты) и занимает сотни байт; запись со __slots__
+    хранит имя, статус (интернированная строка — одна на все записи),
+    дату проверки числом и id. Доступ по ключам API (homework['status'],
+    homework.get('date_updated')) оставлен, поэтому parse_status
+    принимает и словари, и записи.
+    """
+
+    __slots__ = ('name', 'status', 'updated', 'id')
+
+    _KEYS = {
+        'homework_name': 'name',
+        'status': 'status',
+        'date_updated': 'updated',
+        'id': 'id',
+    }
+
+    def __init__(self, name: str, status: str, updated=None, id=None):
+        self.name = name
+        self.status = sys.intern(status)
+        self.updated = to_timestamp(updated)
+        self.id = id
+
+    @classmethod
+    def from_api(cls, item):
+        """
+        Запись из элемента ответа API.
+
+        Как и parse_status, выбрасывает KeyError без homework_name
+        или status.
+        """
+        if isinstance(item, cls):
+            return item
+        return cls(
+            item['homework_name'], item['status'],
+            item.get('date_updated'), item.get('id')
+        )
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._KEYS[key])
+        except (KeyError, AttributeError):
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return (self.name, self.status, self.updated) == (
+            other.name, other.status, other.updated
+        )
+
+    def __repr__(self):
+        return f'Homework({self.name!r}, {self.status!r}, {self.updated!r})'
+
+
+def from_api(homeworks) -> list:
+    """Записи для списка домашних работ из check_response."""
+    return [Homework.from_api(item) for item in homeworks]
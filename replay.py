@@ -0,0 +1,224 @@
+"""
+Запись ответов API Практикума и их воспроизведение.
+
+Запись включается переменной PRACTICUM_RECORD (путь к файлу,
+.gz — со сжатием): каждый запрос к homework_statuses дописывается
+строкой JSON. Воспроизведение прогоняет записанные ответы через
+check_response, поиск изменений, parse_status и очередь отправки:
+
+    python replay.py traffic.jsonl.gz --speed 0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import clock
+import homework
+import records
+import storage
+import tracker
+
+RECORD_FILE = os.getenv('PRACTICUM_RECORD')
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Recorder:
+    """
+    Журнал пар запрос/ответ: одна строка JSON на запрос.
+
+    Поля: time, account (хэш токена — сам токен не пишется),
+    from_date, status (0 — сетевая ошибка), body (тело ответа или
+    текст ошибки). Запись из потоков пула защищена блокировкой.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = _open(path, 'a')
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, token: str, from_date: int, status: int, body: str):
+        line = json.dumps({
+            'time': round(clock.time(), 3),
+            'account': storage.account_key(token),
+            'from_date': from_date,
+            'status': status,
+            'body': body,
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def get_recorder():
+    """Recorder для PRACTICUM_RECORD или None, если запись выключена."""
+    global _recorder
+    if _recorder is None and RECORD_FILE:
+        with _recorder_lock:
+            if _recorder is None:
+                import atexit
+                _recorder = Recorder(RECORD_FILE)
+                atexit.register(_recorder.close)
+                logging.info('Запись ответов API в %s', RECORD_FILE)
+    return _recorder
+
+
+def set_recorder(recorder):
+    """Заменить журнал записи (None — выключить); вернуть прежний."""
+    global _recorder
+    previous, _recorder = _recorder, recorder
+    return previous
+
+
+def read(path: str):
+    """Записи журнала по порядку."""
+    with _open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Replayer:
+    """
+    Воспроизведение журнала через конвейер бота без сети Практикума.
+
+    Ответы обрабатываются так же, как в poller.Poller: check_response,
+    records.Homework, tracker.StatusIndex, parse_status и
+    delivery.DeliveryQueue. Паузы между записями сохраняются с
+    ускорением speed; speed=0 — без пауз, так быстро, как получится.
+    Сообщения аккаунта уходят в чаты chats (по умолчанию — в чат с
+    идентификатором аккаунта, что удобно для фиктивной отправки).
+    """
+
+    def __init__(self, entries, delivery, speed: float = 1.0, chats=None):
+        self.entries = entries
+        self.delivery = delivery
+        self.speed = speed
+        self.chats = chats
+        self.index = tracker.StatusIndex()
+        self.stats = {'responses': 0, 'errors': 0, 'transitions': 0}
+
+    def feed(self, entry: dict):
+        """Обработать одну запись журнала."""
+        self.stats['responses'] += 1
+        if entry['status'] != 200:
+            self.stats['errors'] += 1
+            return
+        account = entry['account']
+        try:
+            response = json.loads(entry['body'])
+            homeworks = records.from_api(homework.check_response(response))
+            for item in self.index.diff(account, homeworks):
+                message = homework.parse_status(item)
+                self.delivery.put_many(self.chats or (account,), message)
+                self.index.update(account, item)
+                self.stats['transitions'] += 1
+        except (ValueError, KeyError, TypeError,
+                homework.PracticumException) as e:
+            logging.error('Повтор, %s: %s', account, e)
+            self.stats['errors'] += 1
+
+    async def run(self) -> dict:
+        """
+        Воспроизвести журнал и дождаться отправки сообщений.
+
+        :return: Счётчики и длительность
+        """
+        started = clock.monotonic()
+        first = None
+        self.delivery.start()
+        try:
+            for entry in self.entries:
+                if first is None:
+                    first = entry['time']
+                if self.speed:
+                    wait = ((entry['time'] - first) / self.speed
+                            - (clock.monotonic() - started))
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                self.feed(entry)
+                if not self.stats['responses'] % 100:
+                    # Очередь отправки работает, пока идёт разбор
+                    await asyncio.sleep(0)
+            await self.delivery.join()
+        finally:
+            await self.delivery.stop()
+        seconds = clock.monotonic() - started
+        return dict(
+            self.stats, seconds=round(seconds, 3),
+            per_second=round(self.stats['responses'] / seconds, 1)
+            if seconds else None
+        )
+
+
+class _Sink:
+    """Фиктивная отправка: только считает сообщения."""
+
+    def __init__(self):
+        self.messages = 0
+
+    def __call__(self, bot, chat_id, message: str):
+        self.messages += 1
+
+
+def replay(path: str, speed: float = 0, bot=None, chats=None) -> dict:
+    """
+    Воспроизвести журнал path.
+
+    Без bot сообщения никуда не отправляются и только считаются.
+    """
+    from delivery import DeliveryQueue
+
+    sink = None
+    if bot is None:
+        sink = _Sink()
+        queue = DeliveryQueue(None, send=sink, rate=1e9, chat_rate=1e9)
+    else:
+        queue = DeliveryQueue(bot)
+    result = clock.run(
+        Replayer(read(path), queue, speed=speed, chats=chats).run()
+    )
+    if sink is not None:
+        result['messages'] = sink.messages
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Воспроизведение записанных ответов API Практикума'
+    )
+    parser.add_argument('path', help='журнал PRACTICUM_RECORD')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='ускорение времени; 0 — без пауз')
+    parser.add_argument('--chat', action='append',
+                        help='отправлять в этот чат через TELEGRAM_TOKEN '
+                             '(по умолчанию сообщения только считаются)')
+    args = parser.parse_args(argv)
+    homework.setup_logging()
+    bot = None
+    if args.chat:
+        from telegram import Bot
+        bot = Bot(token=homework.TELEGRAM_TOKEN)
+    result = replay(args.path, args.speed, bot=bot, chats=args.chat)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
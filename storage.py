@@ -0,0 +1,179 @@
+"""Постоянное хранилище курсоров и последних отправленных статусов."""
+import hashlib
+import logging
+import os
+import sqlite3
+
+STATE_DB = os.getenv('STATE_DB', 'state.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    account TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS statuses (
+    account TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated INTEGER,
+    PRIMARY KEY (account, homework)
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    account TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated INTEGER,
+    noticed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_account
+    ON transitions (account, noticed);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    PRIMARY KEY (token, chat_id)
+);
+"""
+
+
+def account_key(token: str) -> str:
+    """
+    Идентификатор аккаунта: хэш токена.
+
+    Курсоры, статусы и история хранятся по этому ключу; сам токен
+    записывается только в таблицу подписок.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+class StateStore:
+    """
+    Хранилище состояния в SQLite.
+
+    Для каждого аккаунта хранится курсор from_date, для каждой
+    домашней работы — последний отправленный статус и история
+    изменений (transitions), а также подписки чатов, добавленные во
+    время работы бота. Курсор и отправленные статусы одного опроса
+    записываются одной транзакцией, поэтому после перезапуска опрос
+    продолжается с того же места без повторных и пропущенных
+    уведомлений. В подписках лежат токены Практикума, поэтому файл
+    базы доступен только владельцу (0600).
+    """
+
+    def __init__(self, path: str = STATE_DB):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # Файлы журнала WAL SQLite создаёт с правами файла базы
+        os.chmod(path, 0o600)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def load_cursors(self) -> dict:
+        """
+        Все курсоры одним запросом.
+
+        :return: {account: current_date}
+        """
+        cursor = self.connection.execute(
+            'SELECT account, from_date FROM cursors'
+        )
+        cursors = dict(cursor.fetchall())
+        logging.info('Загружено курсоров из %s: %d', self.path, len(cursors))
+        return cursors
+
+    def load_cursor(self, account: str):
+        """Курсор одного аккаунта или None."""
+        row = self.connection.execute(
+            'SELECT from_date FROM cursors WHERE account = ?', (account,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load_statuses(self, account: str = None) -> list:
+        """
+        Отправленные статусы одним запросом: все или одного аккаунта.
+
+        :return: Список (account, homework, status, updated)
+        """
+        if account is None:
+            return self.connection.execute(
+                'SELECT account, homework, status, updated FROM statuses'
+            ).fetchall()
+        return self.connection.execute(
+            'SELECT account, homework, status, updated FROM statuses '
+            'WHERE account = ?', (account,)
+        ).fetchall()
+
+    def save_poll(self, account: str, current_date: int,
+                  notified: list = ()):
+        """
+        Сохранить результат опроса одной транзакцией.
+
+        :param account: Идентификатор аккаунта
+        :param current_date: Новый курсор
+        :param notified: Список (homework, status, updated) отправленных
+        """
+        # clock тянет asyncio, а хранилище нужно и --check без него
+        import clock
+
+        noticed = clock.time()
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO cursors (account, from_date) '
+                'VALUES (?, ?)',
+                (account, current_date)
+            )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO statuses '
+                '(account, homework, status, updated) VALUES (?, ?, ?, ?)',
+                ((account, *row) for row in notified)
+            )
+            self.connection.executemany(
+                'INSERT INTO transitions '
+                '(account, homework, status, updated, noticed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((account, *row, noticed) for row in notified)
+            )
+
+    def load_history(self, account: str, limit: int = 10) -> list:
+        """
+        Последние изменения статусов аккаунта, новые первыми.
+
+        :return: Список (homework, status, updated, noticed)
+        """
+        return self.connection.execute(
+            'SELECT homework, status, updated, noticed FROM transitions '
+            'WHERE account = ? ORDER BY noticed DESC, rowid DESC LIMIT ?',
+            (account, limit)
+        ).fetchall()
+
+    def load_subscriptions(self) -> list:
+        """
+        Подписки, добавленные во время работы бота.
+
+        :return: Список (token, chat_id)
+        """
+        return self.connection.execute(
+            'SELECT token, chat_id FROM subscriptions'
+        ).fetchall()
+
+    def add_subscription(self, token: str, chat_id: str):
+        """Сохранить подписку чата на токен."""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO subscriptions (token, chat_id) '
+                'VALUES (?, ?)',
+                (token, chat_id)
+            )
+
+    def remove_subscription(self, token: str, chat_id: str):
+        """Удалить подписку чата на токен."""
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM subscriptions WHERE token = ? AND chat_id = ?',
+                (token, chat_id)
+            )
+
+    def close(self):
+        """Закрыть соединение с базой."""
+        self.connection.close()
@@ -0,0 +1,117 @@
+"""Потоковый разбор больших ответов homework_statuses."""
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class HomeworkStream:
+    """
+    Итератор по домашним работам из JSON-ответа, читаемого по частям.
+
+    Массив homeworks разбирается поэлементно, в памяти держится только
+    непрочитанный хвост буфера и текущий элемент, поэтому память не
+    зависит от длины истории. Остальные ключи верхнего уровня
+    (current_date, code, message, ...) после полного прохода лежат
+    в fields; найденный массив homeworks отмечается в has_homeworks.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.fields = {}
+        self.has_homeworks = False
+        self.count = 0
+
+    def _fill(self) -> bool:
+        """Дочитать следующую часть; False, если поток закончился."""
+        if self._eof:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._text.decode(chunk)
+                return True
+        self._buffer += self._text.decode(b'', final=True)
+        self._eof = True
+        return True
+
+    def _skip(self) -> str:
+        """Пропустить пробелы и вернуть следующий символ ('' в конце)."""
+        while True:
+            while (self._pos < len(self._buffer)
+                   and self._buffer[self._pos] in WHITESPACE):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars: str) -> str:
+        char = self._skip()
+        if not char or char not in chars:
+            raise ValueError(
+                f'Ожидался один из {chars!r}, получено {char!r}'
+            )
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """Разобрать одно JSON-значение, при необходимости дочитывая поток."""
+        self._skip()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Число в конце буфера могло оборваться на середине
+            if end == len(self._buffer) and not self._eof:
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._expect('{')
+        if self._skip() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == 'homeworks' and self._skip() == '[':
+                self._pos += 1
+                self.has_homeworks = True
+                if self._skip() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        self.count += 1
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.fields[key] = self._value()
+            if self._expect(',}') == '}':
+                return
+
+    def summary(self) -> dict:
+        """
+        Ответ API без элементов homeworks — для проверки check_response.
+
+        Если массива не было, ключ homeworks сохраняет исходное значение
+        (или отсутствует), и check_response сообщит об ошибке как обычно.
+        """
+        summary = dict(self.fields)
+        if self.has_homeworks:
+            summary['homeworks'] = []
+        return summary
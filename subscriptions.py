@@ -0,0 +1,100 @@
+"""Реестр подписок: какие чаты получают обновления какого токена."""
+import json
+import logging
+
+
+def read_file(path: str):
+    """
+    Подписки из JSON-файла.
+
+    Элемент списка — {"token": ..., "chat_id": ...}
+    или {"token": ..., "chat_ids": [...]}.
+    :param path: Путь к файлу
+    :return: Список пар (token, chat_id)
+    """
+    with open(path, encoding='utf-8') as file:
+        items = json.load(file)
+    pairs = []
+    for item in items:
+        chat_ids = item.get('chat_ids') or [item['chat_id']]
+        pairs.extend((item['token'], chat_id) for chat_id in chat_ids)
+    return pairs
+
+
+class SubscriptionRegistry:
+    """
+    Подписки токенов Практикума на чаты Telegram.
+
+    На каждый токен заводится один Account, а чаты-подписчики хранятся
+    в его множестве chats. Поэтому токен опрашивается один раз, сколько
+    бы чатов на него ни было подписано, а подписки, добавленные после
+    запуска, сразу видны движку опроса.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self._accounts = {}
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def accounts(self) -> list:
+        """Аккаунты всех токенов с подписчиками."""
+        return [account for account in self._accounts.values()
+                if account.chats]
+
+    def get(self, token: str):
+        """Аккаунт токена или None."""
+        return self._accounts.get(token)
+
+    def add(self, token: str, chat_id, persist: bool = False):
+        """
+        Подписать чат на обновления токена.
+
+        :param token: Токен Практикума
+        :param chat_id: Идентификатор чата
+        :param persist: Сохранить подписку в хранилище
+        :return: (Account, True если аккаунт создан)
+        """
+        # poller тянет за собой telegram, а read_file нужен и без него
+        from poller import Account
+
+        chat_id = str(chat_id)
+        account = self._accounts.get(token)
+        created = account is None
+        if created:
+            account = self._accounts[token] = Account(token, ())
+        account.chats.add(chat_id)
+        if persist and self.store:
+            self.store.add_subscription(token, chat_id)
+        return account, created
+
+    def remove(self, token: str, chat_id):
+        """Отписать чат от токена."""
+        chat_id = str(chat_id)
+        account = self._accounts.get(token)
+        if account is not None:
+            account.chats.discard(chat_id)
+        if self.store:
+            self.store.remove_subscription(token, chat_id)
+
+    def chats_of(self, chat_id) -> list:
+        """Аккаунты, на которые подписан чат."""
+        chat_id = str(chat_id)
+        return [account for account in self._accounts.values()
+                if chat_id in account.chats]
+
+    def load_file(self, path: str):
+        """
+        Загрузить подписки из JSON-файла (формат — в read_file).
+
+        :param path: Путь к файлу
+        """
+        for token, chat_id in read_file(path):
+            self.add(token, chat_id)
+        logging.info('Подписки из %s: токенов %d', path, len(self))
+
+    def load_store(self):
+        """Загрузить подписки, сохранённые в хранилище."""
+        for token, chat_id in self.store.load_subscriptions():
+            self.add(token, chat_id)
@@ -0,0 +1,341 @@
+"""Опрос аккаунтов несколькими процессами: шардирование и перебалансировка."""
+import asyncio
+import bisect
+import errno
+import fcntl
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+import homework
+import outbox
+import profiling
+import storage
+
+# Сколько процессов-обработчиков запускает homework.py --workers
+WORKERS = int(os.getenv('WORKERS', 1))
+# Каталог файлов блокировок аккаунтов, общий для всех обработчиков
+LOCK_DIR = os.getenv('LOCK_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(storage.STATE_DB)), 'locks'
+)
+# Как часто обработчик проверяет состав и дозахватывает аккаунты, с
+REBALANCE_INTERVAL = 1.0
+# Пауза перед перезапуском упавшего обработчика, с
+RESTART_DELAY = float(os.getenv('WORKER_RESTART_DELAY', 5))
+
+# Обработчики запускаются заново, а не через fork: потоки
+# логирования и пулы соединений родителя им не достаются
+_context = multiprocessing.get_context('spawn')
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Консистентное хэширование аккаунтов по обработчикам.
+
+    Каждый обработчик занимает replicas точек на кольце, аккаунт
+    принадлежит ближайшей точке по часовой стрелке. При добавлении
+    или уходе обработчика переезжает только около 1/N аккаунтов.
+    """
+
+    def __init__(self, nodes=(), replicas: int = 100):
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_hash(f'{node}#{i}'), node)
+            for node in self.nodes for i in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def node_for(self, key: str):
+        """Обработчик ключа или None, если кольцо пустое."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class AccountLocks:
+    """
+    Файлы блокировок аккаунтов (fcntl.flock) в общем каталоге.
+
+    Аккаунт опрашивает только процесс, держащий его блокировку,
+    поэтому даже при расхождении в составе обработчиков один аккаунт
+    не опрашивается дважды. Блокировки упавшего процесса снимает ядро.
+    """
+
+    def __init__(self, directory: str = LOCK_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+
+    def __contains__(self, key):
+        return key in self._files
+
+    def __len__(self):
+        return len(self._files)
+
+    def acquire(self, key: str) -> bool:
+        """Захватить блокировку без ожидания; False, если она занята."""
+        if key in self._files:
+            return True
+        descriptor = os.open(
+            os.path.join(self.directory, f'{key}.lock'),
+            os.O_RDWR | os.O_CREAT, 0o644
+        )
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            os.close(descriptor)
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+        self._files[key] = descriptor
+        return True
+
+    def release(self, key: str):
+        """Освободить блокировку."""
+        descriptor = self._files.pop(key, None)
+        if descriptor is not None:
+            fcntl.flock(descriptor, fcntl.LOCK_UN)
+            os.close(descriptor)
+
+    def release_all(self):
+        for key in list(self._files):
+            self.release(key)
+
+
+class Shard:
+    """
+    Доля аккаунтов одного обработчика.
+
+    По составу обработчиков (members) выбирает свои аккаунты через
+    HashRing. Чужие аккаунты убираются из расписания, и блокировка
+    отпускается, только когда их опрос завершён. Свои аккаунты
+    добавляются в движок, как только удалось захватить блокировку;
+    если она ещё у прежнего владельца, попытка повторяется на
+    следующем шаге.
+    """
+
+    def __init__(self, worker_id, registry, engine, locks: AccountLocks):
+        self.worker_id = worker_id
+        self.registry = registry
+        self.engine = engine
+        self.locks = locks
+        self.ring = HashRing()
+        self.owned = {}
+        self._releasing = set()
+
+    def rebalance(self, members=None):
+        """
+        Применить новый состав обработчиков и дозахватить аккаунты.
+
+        :param members: Идентификаторы живых обработчиков
+            (None — состав не изменился)
+        """
+        if members is not None:
+            self.ring = HashRing(members)
+            logging.info('Обработчик %s: состав %s',
+                         self.worker_id, self.ring.nodes)
+        wanted = {
+            account.key: account for account in self.registry.accounts()
+            if self.ring.node_for(account.key) == self.worker_id
+        }
+        for key in list(self.owned):
+            if key not in wanted:
+                self.engine.drop(self.owned.pop(key))
+                self._releasing.add(key)
+        for key in list(self._releasing):
+            if key in wanted:
+                self._releasing.discard(key)
+            elif key not in self.engine.inflight:
+                self.locks.release(key)
+                self._releasing.discard(key)
+        for key, account in wanted.items():
+            if key not in self.owned and self.locks.acquire(key):
+                self.owned[key] = account
+                self.engine.add(account)
+
+    async def run(self, connection):
+        """
+        Движок опроса и перебалансировка по сообщениям супервизора.
+
+        :param connection: Конец multiprocessing.Pipe; None в
+            сообщении — остановка
+        """
+        task = asyncio.create_task(self.engine.run())
+        try:
+            while not task.done():
+                members = None
+                while connection.poll():
+                    message = connection.recv()
+                    if message is None:
+                        self.engine.stop()
+                        break
+                    members = message
+                self.rebalance(members)
+                await asyncio.wait({task}, timeout=REBALANCE_INTERVAL)
+        finally:
+            self.engine.stop()
+            await task
+            self.locks.release_all()
+
+
+def worker(worker_id, members, connection, shares: int):
+    """Процесс-обработчик: свой движок, хранилище и бот Telegram."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: connection.close())
+    homework.setup_logging()
+    profiling.install()
+    store = storage.StateStore()
+    engine = None
+    try:
+        registry = homework.load_registry(store)
+        engine = homework.create_engine(
+            [], store, shares=shares,
+            outbox_file=outbox.worker_path(outbox.OUTBOX_FILE, worker_id)
+        )
+        shard = Shard(worker_id, registry, engine, AccountLocks())
+        shard.rebalance(members)
+        asyncio.run(shard.run(connection))
+    except (EOFError, OSError):
+        pass
+    finally:
+        if engine is not None:
+            engine.delivery.close()
+        store.close()
+
+
+class Supervisor:
+    """
+    Запускает обработчики и следит за ними.
+
+    Текущий состав рассылается всем обработчикам; они сами выбирают
+    свои аккаунты по HashRing. Упавший обработчик исключается из
+    состава (его аккаунты подхватывают остальные) и через
+    restart_delay запускается заново. SIGTTIN добавляет обработчик,
+    SIGTTOU убирает, SIGTERM и SIGINT останавливают всех, SIGUSR2
+    пересылается обработчикам (profiling).
+    """
+
+    def __init__(self, workers: int = WORKERS, target=worker,
+                 restart_delay: float = RESTART_DELAY):
+        self.size = workers
+        self.target = target
+        self.restart_delay = restart_delay
+        self.processes = {}
+        self._connections = {}
+        self._restart = {}
+        self._next_id = 0
+        self._wanted = workers
+        self._running = False
+
+    @property
+    def members(self) -> list:
+        return sorted(self.processes)
+
+    def _spawn(self, worker_id):
+        parent, child = _context.Pipe()
+        process = _context.Process(
+            target=self.target, name=f'worker-{worker_id}',
+            args=(worker_id, self.members + [worker_id], child, self.size)
+        )
+        process.start()
+        child.close()
+        self.processes[worker_id] = process
+        self._connections[worker_id] = parent
+        logging.info('Обработчик %s запущен, pid %s', worker_id, process.pid)
+
+    def _broadcast(self):
+        members = self.members
+        for worker_id, connection in list(self._connections.items()):
+            try:
+                connection.send(members)
+            except OSError:
+                pass
+
+    def _retire(self, worker_id):
+        process = self.processes.pop(worker_id)
+        connection = self._connections.pop(worker_id)
+        try:
+            connection.send(None)
+        except OSError:
+            pass
+        process.join(30)
+        if process.is_alive():
+            process.terminate()
+        connection.close()
+
+    def scale(self, workers: int):
+        """Изменить число обработчиков и разослать новый состав."""
+        self.size = self._wanted = max(1, workers)
+        while len(self.processes) + len(self._restart) < self.size:
+            self._spawn(self._next_id)
+            self._next_id += 1
+        while len(self.processes) > self.size:
+            self._retire(max(self.processes))
+        self._broadcast()
+
+    def check(self):
+        """Убрать упавшие обработчики и перезапустить их в свой срок."""
+        changed = False
+        for worker_id, process in list(self.processes.items()):
+            if not process.is_alive():
+                logging.error('Обработчик %s завершился, код %s',
+                              worker_id, process.exitcode)
+                del self.processes[worker_id]
+                self._connections.pop(worker_id).close()
+                self._restart[worker_id] = time.time() + self.restart_delay
+                changed = True
+        for worker_id, when in list(self._restart.items()):
+            if when <= time.time():
+                del self._restart[worker_id]
+                if len(self.processes) < self.size:
+                    self._spawn(worker_id)
+                    changed = True
+        if changed:
+            self._broadcast()
+
+    def stop(self, *args):
+        self._running = False
+
+    def _forward(self, signum, frame):
+        for process in list(self.processes.values()):
+            if process.pid is not None:
+                try:
+                    os.kill(process.pid, signum)
+                except OSError:
+                    pass
+
+    def _resize(self, delta: int):
+        # Из обработчика сигнала только запоминаем, применяет run()
+        self._wanted = max(1, self._wanted + delta)
+
+    def run(self):
+        """Запустить обработчики и следить за ними до stop()."""
+        self._running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTTIN, lambda *args: self._resize(1))
+        signal.signal(signal.SIGTTOU, lambda *args: self._resize(-1))
+        if profiling.PROFILE_SIGNAL is not None:
+            signal.signal(profiling.PROFILE_SIGNAL, self._forward)
+        self.scale(self.size)
+        try:
+            while self._running:
+                time.sleep(REBALANCE_INTERVAL)
+                if self._wanted != self.size:
+                    self.scale(self._wanted)
+                self.check()
+        finally:
+            for worker_id in list(self.processes):
+                self._retire(worker_id)
@@ -0,0 +1,48 @@
+import pytest
+
+
+class FakeBot:
+    """
+    Бот без сети.
+
+    Отправленные сообщения копятся в sent, а ошибки из failures
+    выбрасываются при отправке по очереди.
+    """
+
+    def __init__(self):
+        self.failures = []
+        self.sent = []
+
+
+def send_message(bot, chat_id, message):
+    if bot.failures:
+        raise bot.failures.pop(0)
+    bot.sent.append((chat_id, message))
+
+
+class FakeQueue:
+    """Очередь отправки, которая только запоминает сообщения."""
+
+    def __init__(self):
+        self.sent = []
+
+    def put_many(self, chat_ids, text, urgent=True):
+        self.sent.extend((chat_id, text) for chat_id in chat_ids)
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def fake_bot():
+    return FakeBot()
+
+
+@pytest.fixture
+def fake_send():
+    return send_message
+
+
+@pytest.fixture
+def fake_queue():
+    return FakeQueue()
@@ -0,0 +1,60 @@
+import time
+
+import backoff
+import clock
+
+
+class TestBackoffScheduler:
+
+    def test_delay_grows_per_key_with_jitter(self):
+        scheduler = backoff.BackoffScheduler(
+            base=10, max_delay=40, jitter=0.1, threshold=100
+        )
+        delays = [scheduler.failure('a') for _ in range(4)]
+        assert 9 <= delays[0] <= 11
+        assert 18 <= delays[1] <= 22
+        assert 36 <= delays[3] <= 44, 'Пауза ограничена max_delay'
+        assert scheduler.get('b').failures == 0
+        assert scheduler.allow('a') == 0
+
+        scheduler.success('a')
+        assert 9 <= scheduler.failure('a') <= 11
+
+    def test_circuit_opens_and_probes(self):
+        scheduler = backoff.BackoffScheduler(base=0.05, jitter=0, threshold=2)
+        scheduler.failure('api')
+        assert scheduler.allow('api') == 0
+        scheduler.failure('api')
+        assert scheduler.get('api').state == backoff.OPEN
+        assert scheduler.allow('api') > 0
+
+        time.sleep(0.15)
+        assert scheduler.allow('api') == 0
+        assert scheduler.get('api').state == backoff.HALF_OPEN
+        assert scheduler.allow('api') > 0, 'Пробная попытка только одна'
+
+        scheduler.failure('api')
+        assert scheduler.get('api').state == backoff.OPEN
+        time.sleep(0.25)
+        assert scheduler.allow('api') == 0
+        scheduler.success('api')
+        assert scheduler.get('api').state == backoff.CLOSED
+        assert len(scheduler) == 0
+
+    def test_lost_probe_reopens_circuit(self):
+        scheduler = backoff.BackoffScheduler(
+            base=10, jitter=0, threshold=1, probe_timeout=60
+        )
+        with clock.use(clock.VirtualClock(start=0)) as virtual:
+            scheduler.failure('api')
+            virtual.advance(10)
+            assert scheduler.allow('api') == 0
+            virtual.advance(30)
+            assert scheduler.allow('api') > 0, 'Пробная попытка ещё идёт'
+            virtual.advance(30)
+            assert scheduler.allow('api') == 10, (
+                'Пробная попытка без результата размыкает выключатель'
+            )
+            assert scheduler.get('api').state == backoff.OPEN
+            virtual.advance(10)
+            assert scheduler.allow('api') == 0, 'Новая пробная попытка'
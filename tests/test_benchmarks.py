@@ -0,0 +1,29 @@
+import homework
+from benchmarks import bench_throughput, soak
+
+
+class TestBenchmarks:
+
+    def test_throughput_against_stubs(self):
+        result = bench_throughput.run(
+            accounts=5, duration=1.5, interval=0.2, change_rate=1
+        )
+        assert result['polls'] >= 5
+        assert result['notifications'] >= 5, (
+            'Сообщения должны доходить до заглушки Telegram'
+        )
+        assert result['latency_ms']['p50'] is not None
+
+    def test_soak_budget(self, monkeypatch):
+        result = soak.run(iterations=300, warmup=200, samples=5, budget=50)
+        assert result['ok'], result['top']
+        assert result['messages'] >= 30, 'Цикл должен доходить до отправки'
+
+        leaked = []
+        parse_status = homework.parse_status
+        monkeypatch.setattr(
+            homework, 'parse_status',
+            lambda item: leaked.append(bytes(1000)) or parse_status(item)
+        )
+        result = soak.run(iterations=300, warmup=200, samples=5, budget=50)
+        assert not result['ok'], 'Утечка должна выходить за бюджет'
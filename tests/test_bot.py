@@ -1,11 +1,22 @@
 import os
 from http import HTTPStatus
 
+import pytest
 import requests
 import telegram
+import transport
 import utils
 
 
+@pytest.fixture(autouse=True)
+def transport_via_requests_get(monkeypatch):
+    # Тесты подменяют requests.get, поэтому запросы пула идут через него
+    monkeypatch.setattr(
+        transport.Transport, 'get',
+        lambda self, url, **kwargs: requests.get(url, **kwargs)
+    )
+
+
 class MockResponseGET:
 
     def __init__(self, url, params=None, random_timestamp=None,
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import backoff
+import clock
+import homework
+import poller
+
+WEEK = 7 * 24 * 3600
+
+
+class TestVirtualClock:
+
+    def test_sleep_is_instant(self):
+        virtual = clock.VirtualClock(start=1000)
+
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            await asyncio.sleep(3600)
+            before = clock.time()
+            await loop.run_in_executor(None, time.sleep, 0.05)
+            return before, clock.time()
+
+        started = time.monotonic()
+        with clock.use(virtual):
+            before, after = virtual.run(scenario())
+        assert time.monotonic() - started < 1
+        assert before == 4600, 'asyncio.sleep идёт по виртуальным часам'
+        assert after == before, 'Пока работает поток пула, время стоит'
+        assert clock.get_clock() is not virtual
+
+    def test_timeout_escalation(self, monkeypatch):
+        monkeypatch.setattr(homework, 'time_sleep_error', 30)
+        virtual = clock.VirtualClock(start=0)
+        with clock.use(virtual):
+            for _ in range(11):
+                homework.timeout_and_logging()
+        assert virtual.time() == 30 * (2 ** 11 - 1), (
+            'Пауза удваивается от 30 до 25600 секунд'
+        )
+        assert homework.time_sleep_error == 30, 'После 51200 пауза сбрасывается'
+
+    def test_week_of_failures(self):
+        polls = []
+
+        def fetch(token, current_date):
+            polls.append(clock.time())
+            raise homework.UpstreamError('Сервис недоступен')
+
+        async def scenario(engine):
+            asyncio.get_running_loop().call_later(WEEK, engine.stop)
+            await engine.run()
+
+        started = time.monotonic()
+        with clock.use(clock.VirtualClock()) as virtual:
+            engine = poller.Poller(
+                [poller.Account('token', {1})], None, fetch=fetch
+            )
+            virtual.run(scenario(engine))
+        assert time.monotonic() - started < 30, (
+            'Неделя опроса должна проходить за секунды'
+        )
+        gaps = [b - a for a, b in zip(polls, polls[1:])]
+        longest = backoff.BACKOFF_MAX * (1 + backoff.BACKOFF_JITTER) + 1
+        assert WEEK / longest <= len(polls) < 1000
+        assert max(gaps) <= longest, 'Пауза не превышает BACKOFF_MAX'
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+
+import requests
+from telegram import error
+
+import backoff
+import clock
+import commands
+import poller
+import records
+import storage
+import subscriptions
+from benchmarks.stubs import TelegramHandler, make_server
+
+
+def make_commands(tmp_path, bot):
+    store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+    registry = subscriptions.SubscriptionRegistry(store)
+    account, _ = registry.add('token', 7)
+    engine = poller.Poller(registry.accounts(), bot, store=store)
+    handler = commands.Commands(
+        registry, engine, store, check=lambda token: None, per_chat=2
+    )
+    return handler, account
+
+
+class TestCommands:
+
+    def test_status_from_index(self, tmp_path, fake_bot):
+        handler, account = make_commands(tmp_path, fake_bot)
+        handler.engine.index.update(
+            account.key, records.Homework('hw1.zip', 'approved', 100)
+        )
+        reply = handler.handle('7', '/status')
+        assert 'hw1.zip' in reply and 'ревьюеру всё понравилось' in reply, (
+            '/status отвечает из снимка статусов движка'
+        )
+        assert 'Нет подписок' in handler.handle('8', '/status')
+        assert handler.handle('7', 'привет') is None
+        assert handler.handle('7', ' \n ') is None, 'Пустое сообщение'
+
+    def test_history_from_store(self, tmp_path, fake_bot):
+        handler, account = make_commands(tmp_path, fake_bot)
+        handler.store.save_poll(account.key, 1, [('hw1', 'reviewing', None)])
+        handler.store.save_poll(account.key, 2, [('hw1', 'approved', None)])
+        reply = handler.handle('7', '/history 1')
+        assert 'hw1' in reply and reply.count('\n') == 1, (
+            '/history N показывает N последних изменений'
+        )
+        assert 'Использование' in handler.handle('7', '/history x')
+
+    def test_subscribe_schedules_account(self, tmp_path, fake_bot):
+        handler, _ = make_commands(tmp_path, fake_bot)
+        handler.handle('9', '/subscribe new-token')
+        account = handler.registry.get('new-token')
+        assert account.key in handler.engine.accounts, (
+            'Новый токен сразу попадает в расписание опроса'
+        )
+        assert ('new-token', '9') in handler.store.load_subscriptions()
+        handler.handle('9', '/unsubscribe')
+        assert not account.chats
+        handler.handle('9', '/subscribe@bot new-token')
+        assert account.chats == {'9'}
+
+    def test_subscribe_checks_token(self, tmp_path, fake_bot):
+        handler, _ = make_commands(tmp_path, fake_bot)
+        checked = []
+
+        def check(token):
+            checked.append(token)
+            return None if token.startswith('good') else 'Практикум не принял'
+
+        handler.check = check
+        reply = handler.handle('9', '/subscribe junk')
+        assert reply == 'Практикум не принял'
+        assert handler.registry.get('junk') is None
+        assert handler.store.load_subscriptions() == [], (
+            'Непроверенный токен не сохраняется и не опрашивается'
+        )
+        handler.prepare('/subscribe good-1')
+        handler.handle('9', '/subscribe good-1')
+        handler.handle('9', '/subscribe good-2')
+        assert checked == ['junk', 'good-1', 'good-2'], (
+            'Токен проверяется один раз, заранее в prepare()'
+        )
+        handler.handle('10', '/subscribe good-1')
+        assert checked[-1] == 'good-2', 'Известный токен не проверяется'
+        assert 'Не больше 2' in handler.handle('9', '/subscribe good-3')
+        assert handler.registry.get('good-3') is None
+
+
+class TestCommandListener:
+
+    def test_reply_through_bot_api(self, tmp_path):
+        from telegram import Bot
+
+        from delivery import DeliveryQueue
+
+        server = make_server(TelegramHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+        bot = Bot(token='123:stub', base_url=f'{base}/bot')
+        handler, _ = make_commands(tmp_path, bot)
+        queue = DeliveryQueue(bot)
+        listener = commands.CommandListener(bot, handler, queue, timeout=1)
+
+        async def scenario():
+            queue.start()
+            task = asyncio.create_task(listener.run())
+            for _ in range(50):
+                if server.stats['texts']:
+                    break
+                await asyncio.sleep(0.1)
+            listener.stop()
+            await task
+            await queue.stop()
+
+        try:
+            requests.post(f'{base}/push', json={'chat_id': 7, 'text': '/help'})
+            asyncio.run(scenario())
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert server.stats['texts'] == [['7', commands.HELP]], (
+            'Ответ на команду уходит через очередь отправки'
+        )
+        assert listener.offset == 2, 'Обработанное обновление подтверждается'
+
+    def test_get_updates_error_backs_off(self):
+        class Bot:
+            calls = 0
+
+            def get_updates(self, **kwargs):
+                self.calls += 1
+                if self.calls == 3:
+                    listener.stop()
+                    return []
+                raise error.NetworkError('Bad Gateway')
+
+        listener = commands.CommandListener(Bot(), None, None, timeout=1)
+        virtual = clock.VirtualClock(start=0)
+        with clock.use(virtual):
+            virtual.run(listener.run())
+
+        assert virtual.time() >= 3 * backoff.BACKOFF_BASE * (
+            1 - backoff.BACKOFF_JITTER
+        ), 'Пауза после ошибок getUpdates растёт по backoff'
+        assert listener.backoff.get(commands.UPSTREAM).failures == 0, (
+            'Успешный getUpdates сбрасывает паузу'
+        )
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+from telegram import error
+
+import delivery
+from ratelimit import TokenBucket
+
+
+async def deliver(queue, messages):
+    queue.start()
+    for chat_id, text in messages:
+        queue.put(chat_id, text)
+    await asyncio.wait_for(queue.join(), 5)
+    await queue.stop()
+
+
+class TestDeliveryQueue:
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(10, 1)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() > 0
+        assert bucket.reserve() > 0
+        assert bucket.tokens < 0
+
+    def test_retry_is_scheduled_and_order_kept(self, fake_bot, fake_send):
+        fake_bot.failures.append(error.NetworkError('timeout'))
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, chat_rate=1000, retry_delay=0.01
+        )
+        asyncio.run(deliver(queue, [(1, 'a'), (1, 'b'), (2, 'c')]))
+
+        assert [m for chat, m in fake_bot.sent if chat == 1] == ['a', 'b']
+        assert (2, 'c') in fake_bot.sent
+
+    def test_permanent_error_dropped(self, fake_bot, fake_send):
+        fake_bot.failures.append(error.BadRequest('chat not found'))
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, chat_rate=1000
+        )
+        asyncio.run(deliver(queue, [(1, 'a'), (1, 'b')]))
+
+        assert fake_bot.sent == [(1, 'b')]
+        assert queue.depth == 0
+
+    def test_slow_chat_does_not_block_others(self, fake_bot, fake_send):
+        queue = delivery.DeliveryQueue(fake_bot, send=fake_send, chat_rate=5)
+        messages = [(1, str(i)) for i in range(3)] + [(2, 'x')]
+        start = time.monotonic()
+        asyncio.run(deliver(queue, messages))
+
+        assert time.monotonic() - start >= 0.3, (
+            'Сообщения в один чат должны ограничиваться chat_rate'
+        )
+        assert fake_bot.sent.index((2, 'x')) < fake_bot.sent.index((1, '2'))
+
+    def test_digest_coalesces_burst(self, fake_bot, fake_send):
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, chat_rate=1000, digest_window=0.05
+        )
+
+        async def burst():
+            queue.start()
+            for i in range(30):
+                queue.put(1, f'работа {i}', urgent=False)
+            queue.put(2, 'одна', urgent=False)
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+
+        asyncio.run(burst())
+        assert fake_bot.sent == [
+            (1, '\n\n'.join(f'работа {i}' for i in range(30))),
+            (2, 'одна'),
+        ], 'Сообщения чата за окно уходят одной сводкой'
+
+    def test_digest_split_at_message_limit(self, fake_bot, fake_send):
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, chat_rate=1000, digest_window=0.01
+        )
+        texts = [str(i) * 1000 for i in range(10)]
+
+        async def burst():
+            queue.start()
+            for text in texts:
+                queue.put(1, text, urgent=False)
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+
+        asyncio.run(burst())
+        sizes = [len(message) for _, message in fake_bot.sent]
+        assert len(fake_bot.sent) == 3 and max(sizes) <= delivery.MESSAGE_LIMIT
+        joined = '\n\n'.join(m for _, m in fake_bot.sent)
+        assert joined == '\n\n'.join(texts), (
+            'Сводка делится между сообщениями, не разрезая их'
+        )
+
+    def test_urgent_skips_digest_window(self, fake_bot, fake_send):
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, chat_rate=1000, digest_window=60
+        )
+
+        async def scenario():
+            queue.start()
+            queue.put(1, 'a', urgent=False)
+            queue.put(1, 'b')
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+
+        start = time.monotonic()
+        asyncio.run(scenario())
+        assert time.monotonic() - start < 1, 'Срочное не ждёт окна сводки'
+        assert fake_bot.sent == [(1, 'a\n\nb')]
+
+    def test_rejected_probe_closes_circuit(self, fake_bot, fake_send):
+        fake_bot.failures.append(
+            error.Unauthorized('bot was blocked by the user')
+        )
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, chat_rate=1000
+        )
+        for _ in range(queue.backoff.threshold):
+            queue.backoff.failure(delivery.UPSTREAM)
+        queue.backoff.get(delivery.UPSTREAM).open_until = 0
+        asyncio.run(deliver(queue, [(1, 'a'), (2, 'b')]))
+
+        assert fake_bot.sent == [(2, 'b')], (
+            'Ответ Telegram на пробную отправку замыкает выключатель'
+        )
+        assert queue.backoff.get(delivery.UPSTREAM).state == 'closed'
@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+import admin
+import health
+import poller
+
+
+def make_engine(bot, count=3):
+    accounts = [poller.Account(f'token{i}', [i]) for i in range(count)]
+    return poller.Poller(accounts, bot), accounts
+
+
+class TestHealth:
+
+    def test_fresh_engine_is_ready(self, fake_bot):
+        engine, accounts = make_engine(fake_bot)
+        now = time.time()
+        engine.heartbeat = now
+        for account in accounts:
+            account.next_poll = now + 60
+        accounts[0].last_success = now - 10
+        report = health.engine_report(engine, limit=2, now=now)
+        assert report['alive'] and report['ready'], report['problems']
+        assert report['accounts_total'] == 3
+        assert report['accounts_never_polled'] == 2
+        assert len(report['accounts']) == 2
+        assert report['upstreams']['practicum']['circuit_open'] is False
+
+    def test_wedged_engine(self, fake_bot):
+        engine, accounts = make_engine(fake_bot)
+        now = time.time()
+        engine.heartbeat = now - health.HEALTH_LOOP_STALE - 1
+        accounts[0].next_poll = now - health.HEALTH_OVERDUE - 1
+        engine.inflight[accounts[1].key] = now - health.HEALTH_POLL_TIMEOUT - 1
+        report = health.engine_report(engine, now=now)
+        assert not report['alive'] and not report['ready']
+        assert len(report['problems']) == 3, (
+            'Должны быть видны остановка цикла, зависший и '
+            'просроченный опросы'
+        )
+
+    def test_endpoints(self, fake_bot):
+        engine, _ = make_engine(fake_bot, 1)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), admin.AdminHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+        try:
+            health.attach(partial(health.engine_report, engine))
+            try:
+                urllib.request.urlopen(f'{base}/health')
+            except urllib.error.HTTPError as e:
+                assert e.code == 503, 'Незапущенный движок не жив'
+            else:
+                assert False, 'Ожидался ответ 503'
+            engine.heartbeat = time.time()
+            with urllib.request.urlopen(f'{base}/ready?limit=0') as response:
+                report = json.load(response)
+            assert report['ready'] and report['accounts'] == []
+        finally:
+            health.attach(None)
+            server.shutdown()
+            server.server_close()
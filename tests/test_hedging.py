@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+import hedging
+import homework
+
+
+def attempts(*delays):
+    """Попытки с заданными задержками; возвращают свой номер."""
+    calls = []
+
+    def submit():
+        number = len(calls)
+        calls.append(number)
+
+        def attempt():
+            time.sleep(delays[number])
+            return number
+        return asyncio.get_running_loop().run_in_executor(None, attempt)
+    return submit, calls
+
+
+def timed(coroutine):
+    """Результат и длительность без ожидания брошенных попыток."""
+    async def run():
+        started = time.monotonic()
+        result = await coroutine
+        return result, time.monotonic() - started
+    return asyncio.run(run())
+
+
+def warmed(**kwargs):
+    hedger = hedging.Hedger(min_samples=5, **kwargs)
+    for _ in range(100):
+        hedger.window.add(0.01)
+    return hedger
+
+
+class TestHedger:
+
+    def test_slow_request_is_hedged(self):
+        hedger = warmed(max_rate=1, min_delay=0.05)
+        submit, calls = attempts(1.0, 0.01)
+        result, seconds = timed(hedger.call(submit))
+        assert result == 1, 'Побеждает первый успешный ответ'
+        assert seconds < 0.5
+        assert calls == [0, 1]
+
+    def test_hedge_rate_cap(self):
+        hedger = warmed(max_rate=0.5, min_delay=0.02)
+
+        async def run():
+            hedged = 0
+            for _ in range(4):
+                submit, calls = attempts(0.1, 0.1)
+                await hedger.call(submit)
+                hedged += len(calls) - 1
+            return hedged
+        assert asyncio.run(run()) == 2, (
+            'Дублей не больше доли max_rate от всех запросов'
+        )
+
+    def test_no_hedge_without_history(self):
+        hedger = hedging.Hedger(max_rate=1, min_delay=0.01)
+        submit, calls = attempts(0.1, 0.1)
+        asyncio.run(hedger.call(submit))
+        assert calls == [0]
+        assert len(hedger.window) == 1
+
+    def test_deadline(self):
+        hedger = hedging.Hedger(max_rate=0, deadline=0.1)
+        submit, _ = attempts(0.5)
+
+        async def run():
+            started = time.monotonic()
+            with pytest.raises(homework.UpstreamError):
+                await hedger.call(submit)
+            return time.monotonic() - started
+        assert 0.1 <= asyncio.run(run()) < 0.45, (
+            'Ответ не ждут дольше deadline'
+        )
+
+    def test_error_waits_for_hedge(self):
+        hedger = warmed(max_rate=1, min_delay=0.05)
+
+        def submit():
+            submit.calls += 1
+            if submit.calls == 1:
+                async def fail():
+                    await asyncio.sleep(0.2)
+                    raise homework.UpstreamError('boom')
+                return fail()
+            return asyncio.sleep(0.01, result='ok')
+        submit.calls = 0
+        assert asyncio.run(hedger.call(submit)) == 'ok'
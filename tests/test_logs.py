@@ -0,0 +1,53 @@
+import io
+import json
+import logging
+import threading
+
+import logs
+
+
+class TestLogs:
+
+    def test_json_record_fields(self):
+        record = logging.LogRecord(
+            'root', logging.ERROR, __file__, 1, 'Опрос %s: %s',
+            ('acc', 'timeout'), None
+        )
+        record.account = 'abc123'
+        record.latency = 0.25
+        data = json.loads(logs.JsonFormatter().format(record))
+        assert data['message'] == 'Опрос acc: timeout'
+        assert data['level'] == 'ERROR'
+        assert data['account'] == 'abc123' and data['latency'] == 0.25
+        assert 'chat' not in data
+
+    def test_formatting_off_thread(self):
+        root = logging.getLogger()
+        # Обработчики pytest форматируют записи в основном потоке
+        level, handlers = root.level, root.handlers[:]
+        root.handlers = []
+        stream = io.StringIO()
+        threads = []
+
+        def render():
+            threads.append(threading.current_thread())
+            return 'тело'
+
+        calls = []
+        logs.setup('INFO', 'json', stream=stream)
+        try:
+            logging.debug('Не выводится: %s', logs.Lazy(calls.append, 1))
+            logging.info('Ответ: %s', logs.Lazy(render),
+                         extra={'account': 'abc'})
+        finally:
+            logs.stop()
+            root.setLevel(level)
+            root.handlers = handlers
+
+        assert calls == [], 'Аргументы выключенного уровня не вычисляются'
+        assert threads and threading.main_thread() not in threads, (
+            'Сообщение должно собираться в фоновом потоке'
+        )
+        data = json.loads(stream.getvalue())
+        assert data['message'] == 'Ответ: тело'
+        assert data['account'] == 'abc'
@@ -0,0 +1,49 @@
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import admin
+import metrics
+
+
+class TestMetrics:
+
+    def test_exposition_format(self):
+        registry = metrics.Registry()
+        errors = registry.register(
+            metrics.Counter('errors_total', 'Ошибки', ('type',))
+        )
+        latency = registry.register(
+            metrics.Histogram('latency_seconds', 'Задержка', buckets=(0.1, 1))
+        )
+        depth = registry.register(
+            metrics.Gauge('depth', 'Очередь', function=lambda: 7)
+        )
+        errors.labels('UpstreamError').inc()
+        errors.labels('UpstreamError').inc(2)
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+
+        text = registry.render()
+        assert '# TYPE errors_total counter' in text
+        assert 'errors_total{type="UpstreamError"} 3' in text
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+        assert 'depth 7' in text
+        assert depth.kind == 'gauge'
+
+    def test_metrics_endpoint(self):
+        import homework  # noqa: F401 — регистрирует метрики бота
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), admin.AdminHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_port}/metrics'
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+        server.shutdown()
+        server.server_close()
+
+        assert '# TYPE practicum_request_seconds histogram' in body
+        assert '# TYPE bot_errors_total counter' in body
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import threading
+import time
+
+from telegram import error
+
+import clock
+import delivery
+import outbox
+
+
+class TestOutbox:
+
+    def test_pending_survive_reopen(self, tmp_path):
+        path = str(tmp_path / 'outbox.log')
+        log = outbox.Outbox(path)
+        first = log.add('1', 'первое')
+        log.add('2', 'второе')
+        log.ack(first)
+        log.close()
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('["a", 3, "3", "оборв')
+
+        log = outbox.Outbox(path)
+        assert [item[1:] for item in log.pending()] == [('2', 'второе')], (
+            'После перезапуска остаются только неподтверждённые сообщения'
+        )
+        assert log.add('4', 'новое') == 3, 'Номера продолжаются'
+        log.close()
+
+    def test_group_commit(self, tmp_path, monkeypatch):
+        log = outbox.Outbox(str(tmp_path / 'outbox.log'), fsync_interval=0.05)
+        calls = []
+        fsync = os.fsync
+        monkeypatch.setattr(
+            os, 'fsync', lambda fd: calls.append(fd) or fsync(fd)
+        )
+
+        async def writer(number):
+            log.add(str(number), 'текст')
+            await log.commit()
+
+        async def scenario():
+            await asyncio.gather(*(writer(number) for number in range(50)))
+            await log.commit()
+
+        asyncio.run(scenario())
+        assert len(calls) == 1, 'Записи за интервал сбрасываются одним fsync'
+        log.close()
+
+    def test_commit_waits_for_running_fsync(self, tmp_path, monkeypatch):
+        log = outbox.Outbox(str(tmp_path / 'outbox.log'), fsync_interval=0)
+        events = []
+        started = threading.Event()
+        fsync = os.fsync
+
+        def slow_fsync(fd):
+            started.set()
+            time.sleep(0.1)
+            fsync(fd)
+            events.append('fsync')
+
+        monkeypatch.setattr(os, 'fsync', slow_fsync)
+
+        async def scenario():
+            log.add('1', 'текст')
+            first = asyncio.ensure_future(log.commit())
+            while not started.is_set():
+                await asyncio.sleep(0.001)
+            # Запись уже сброшена идущим fsync, но ещё не на диске
+            await log.commit()
+            events.append('commit')
+            await first
+
+        asyncio.run(scenario())
+        assert events == ['fsync', 'commit'], (
+            'commit() ждёт fsync, покрывающий записи вызывающего'
+        )
+        log.close()
+
+    def test_compaction(self, tmp_path):
+        path = str(tmp_path / 'outbox.log')
+        log = outbox.Outbox(path, fsync_interval=0, compact_min=10)
+
+        async def scenario():
+            for number in range(20):
+                log.ack(log.add('1', f'сообщение {number}'))
+            log.add('1', 'последнее')
+            await log.commit()
+
+        asyncio.run(scenario())
+        with open(path, encoding='utf-8') as file:
+            lines = file.readlines()
+        assert len(lines) == 1, 'Подтверждённые записи вычищаются из журнала'
+        log.close()
+        assert len(outbox.Outbox(path)) == 1
+
+    def test_failed_message_sent_after_restart(self, tmp_path, fake_bot,
+                                               fake_send):
+        path = str(tmp_path / 'outbox.log')
+
+        async def run(queue, messages=()):
+            queue.start()
+            for chat_id, text in messages:
+                queue.put(chat_id, text)
+            await queue.commit()
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+            queue.close()
+
+        fake_bot.failures.append(error.Conflict('terminated by other call'))
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, outbox=outbox.Outbox(path), attempts=1
+        )
+        asyncio.run(run(queue, [('1', 'вердикт'), ('2', 'другой')]))
+        assert fake_bot.sent == [('2', 'другой')]
+
+        fake_bot.sent.clear()
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, outbox=outbox.Outbox(path)
+        )
+        asyncio.run(run(queue))
+        assert fake_bot.sent == [('1', 'вердикт')], (
+            'Неотправленное сообщение уходит после перезапуска'
+        )
+        assert len(outbox.Outbox(path)) == 0
+
+    def test_long_outage_ends_without_restart(self, tmp_path, fake_bot,
+                                              fake_send):
+        path = str(tmp_path / 'outbox.log')
+        fake_bot.failures.extend(
+            error.NetworkError('Bad Gateway') for _ in range(15)
+        )
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, outbox=outbox.Outbox(path), attempts=2
+        )
+
+        async def scenario():
+            queue.start()
+            queue.put('1', 'вердикт')
+            await queue.commit()
+            await queue.join()
+            await queue.stop()
+            queue.close()
+
+        virtual = clock.VirtualClock(start=0)
+        with clock.use(virtual):
+            virtual.run(scenario())
+        assert fake_bot.sent == [('1', 'вердикт')], (
+            'После долгого сбоя сообщение из журнала уходит без перезапуска'
+        )
+        assert virtual.time() > delivery.BACKOFF_MAX
+        assert len(outbox.Outbox(path)) == 0
+
+    def test_blocked_chat_is_forgotten(self, tmp_path, fake_bot, fake_send):
+        path = str(tmp_path / 'outbox.log')
+        fake_bot.failures.append(
+            error.Unauthorized('bot was blocked by the user')
+        )
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, outbox=outbox.Outbox(path)
+        )
+
+        async def scenario():
+            queue.start()
+            queue.put('1', 'вердикт')
+            await queue.commit()
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+            queue.close()
+
+        asyncio.run(scenario())
+        assert len(outbox.Outbox(path)) == 0, (
+            'Сообщение чату, заблокировавшему бота, не повторяется'
+        )
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+import delivery
+import poller
+
+
+async def poll_and_deliver(engine, accounts):
+    engine.delivery.start()
+    delays = [await engine.poll(account) for account in accounts]
+    await engine.delivery.join()
+    await engine.delivery.stop()
+    return delays
+
+
+class TestPoller:
+
+    def test_poll_sends_every_homework(self, random_timestamp, fake_bot,
+                                       fake_send):
+        def fetch(token, current_date):
+            return {
+                'homeworks': [
+                    {'homework_name': f'{token}-1', 'status': 'approved'},
+                    {'homework_name': f'{token}-2', 'status': 'rejected'},
+                ],
+                'current_date': random_timestamp
+            }
+
+        accounts = [poller.Account('a', {1}), poller.Account('b', {2})]
+        queue = delivery.DeliveryQueue(
+            fake_bot, send=fake_send, chat_rate=1000
+        )
+        engine = poller.Poller(accounts, fake_bot, fetch=fetch, delivery=queue)
+        delays = asyncio.run(poll_and_deliver(engine, accounts))
+
+        assert delays == [engine.interval.base, engine.interval.base]
+        assert sorted(chat for chat, _ in fake_bot.sent) == [1, 1, 2, 2]
+        assert all(a.current_date == random_timestamp for a in accounts), (
+            'Курсор аккаунта должен сдвигаться на current_date из ответа'
+        )
+
+    def test_poll_error_keeps_cursor(self, fake_bot, fake_send):
+        def fetch(token, current_date):
+            return {'code': 'not_authenticated', 'message': 'bad token'}
+
+        account = poller.Account('a', {1})
+        cursor = account.current_date
+        engine = poller.Poller(
+            [account], fake_bot, fetch=fetch, send=fake_send
+        )
+        delay = asyncio.run(engine.poll(account))
+
+        assert delay > 0
+        assert engine.backoff.get(account.key).failures == 1
+        assert engine.backoff.get(poller.UPSTREAM).failures == 0, (
+            'Ошибка одного токена не должна влиять на остальные аккаунты'
+        )
+        assert account.current_date == cursor
+
+    def test_unexpected_error_resolves_probe(self, fake_bot, fake_send):
+        def fetch(token, current_date):
+            return {'homeworks': [{'status': 'approved'}], 'current_date': 1}
+
+        account = poller.Account('a', {1})
+        engine = poller.Poller(
+            [account], fake_bot, fetch=fetch, send=fake_send
+        )
+        for _ in range(engine.backoff.threshold):
+            engine.backoff.failure(poller.UPSTREAM)
+        engine.backoff.get(poller.UPSTREAM).open_until = 0
+        asyncio.run(engine.poll(account))
+
+        assert engine.backoff.allow(poller.UPSTREAM) == 0, (
+            'Пробный опрос со сбоем разбора не оставляет выключатель '
+            'полуоткрытым'
+        )
+        assert engine.backoff.get(account.key).failures == 1
+
+    @pytest.mark.parametrize('count', [1, 50])
+    def test_run_polls_all_accounts(self, count, fake_bot, fake_send):
+        polled = set()
+        engine = None
+
+        def fetch(token, current_date):
+            polled.add(token)
+            if len(polled) == count:
+                engine.stop()
+            return {'homeworks': [], 'current_date': current_date}
+
+        accounts = [poller.Account(str(i), {i}) for i in range(count)]
+        engine = poller.Poller(
+            accounts, fake_bot, concurrency=4, fetch=fetch, send=fake_send,
+            rps=1000
+        )
+        asyncio.run(asyncio.wait_for(engine.run(), 5))
+
+        assert polled == {str(i) for i in range(count)}
+
+    def test_adaptive_interval(self):
+        policy = poller.AdaptiveInterval(
+            base=600, reviewing=60, factor=2, max_interval=2000
+        )
+        account = poller.Account('a', {1})
+
+        assert policy.next(account, changed=False, reviewing=False) == 600
+        assert policy.next(account, changed=False, reviewing=False) == 1200
+        assert policy.next(account, changed=False, reviewing=False) == 2000
+        assert policy.next(account, changed=True, reviewing=True) == 60, (
+            'Пока работа на проверке, аккаунт опрашивается чаще'
+        )
+        assert policy.next(account, changed=True, reviewing=False) == 600
+
+    def test_rps_budget(self, fake_bot, fake_send):
+        polled = []
+        engine = None
+
+        def fetch(token, current_date):
+            polled.append(time.monotonic())
+            if len(polled) == 6:
+                engine.stop()
+            return {'homeworks': [], 'current_date': current_date}
+
+        accounts = [poller.Account(str(i), {i}) for i in range(6)]
+        engine = poller.Poller(
+            accounts, fake_bot, fetch=fetch, send=fake_send, rps=10
+        )
+        asyncio.run(asyncio.wait_for(engine.run(), 5))
+
+        assert polled[-1] - polled[0] >= 0.4, (
+            'Опросы должны укладываться в общий бюджет запросов в секунду'
+        )
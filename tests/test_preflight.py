@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+from os.path import abspath, dirname
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+
+def run(args, tmp_path, **env):
+    environ = {
+        key: value for key, value in os.environ.items()
+        if key not in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN',
+                       'TELEGRAM_CHAT_ID', 'PRACTICUM_ACCOUNTS')
+    }
+    environ.update(env, STATE_DB=str(tmp_path / 'state.sqlite3'))
+    # .env из корня не должен влиять на проверку
+    return subprocess.run(
+        [sys.executable, *args], cwd=str(tmp_path), env=environ,
+        capture_output=True, text=True, timeout=60
+    )
+
+
+CHECK_MODULES = (
+    'import sys; sys.path.insert(0, {root!r}); import homework; '
+    'ok = homework.preflight(); '
+    'print(ok, [m for m in ("telegram", "requests", "asyncio") '
+    'if m in sys.modules])'
+)
+
+
+class TestPreflight:
+
+    def test_check_ok_without_telegram(self, tmp_path):
+        accounts = tmp_path / 'accounts.json'
+        accounts.write_text(json.dumps([{'token': 'a', 'chat_ids': [1]}]))
+        result = run(
+            ['-c', CHECK_MODULES.format(root=ROOT)], tmp_path,
+            TELEGRAM_TOKEN='123:abc', PRACTICUM_ACCOUNTS=str(accounts)
+        )
+        assert result.stdout.strip() == 'True []', (
+            'Проверка настроек не должна импортировать telegram и requests'
+            f'\n{result.stdout}{result.stderr}'
+        )
+
+    def test_check_reports_problems(self, tmp_path):
+        result = run(
+            [os.path.join(ROOT, 'homework.py'), '--check'], tmp_path,
+            TELEGRAM_TOKEN='not a token', PRACTICUM_TOKEN='p',
+            TELEGRAM_CHAT_ID='1', POLL_RPS='ten'
+        )
+        assert result.returncode == 1
+        assert 'POLL_RPS' in result.stderr
+        assert 'TELEGRAM_TOKEN' in result.stderr
+
+    def test_check_passes(self, tmp_path):
+        result = run(
+            [os.path.join(ROOT, 'homework.py'), '--check'], tmp_path,
+            TELEGRAM_TOKEN='123:abc', PRACTICUM_TOKEN='p',
+            TELEGRAM_CHAT_ID='1'
+        )
+        assert result.returncode == 0, result.stderr
@@ -0,0 +1,141 @@
+import json
+import os
+import signal
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import admin
+import homework
+import profiling
+
+RESPONSE = {
+    'homeworks': [{'homework_name': 'hw.zip', 'status': 'approved'}],
+    'current_date': 1,
+}
+
+
+@profiling.stage(profiling.ITERATION_STAGE)
+def fetch():
+    sum(i * i for i in range(2000))
+    return RESPONSE
+
+
+def cycle(stop: threading.Event, fetch=fetch):
+    while not stop.is_set():
+        for item in homework.check_response(fetch()):
+            homework.parse_status(item)
+
+
+def sampled(session, thread: str, deadline: float = 10):
+    """Стадия, которая не завершится, пока поток не попадёт в профиль."""
+    @profiling.stage(profiling.ITERATION_STAGE)
+    def held_fetch():
+        # Активное ожидание: ждущий на Event поток профилировщик пропускает
+        stop = time.monotonic() + deadline
+        while time.monotonic() < stop and not any(
+            stack.startswith(f'{thread};') for stack in list(session.stacks)
+        ):
+            pass
+        return RESPONSE
+    return held_fetch
+
+
+def wait(session):
+    assert session.finished.wait(10), 'Сессия профилирования не завершилась'
+
+
+class TestProfiling:
+
+    def test_disabled(self):
+        assert profiling._session is None
+        assert fetch() is RESPONSE
+        assert homework.check_response.__name__ == 'check_response'
+        assert profiling.status()['active'] is False
+        assert profiling.stop() is None, 'Выключенное профилирование'
+
+    def test_iterations(self, tmp_path):
+        stop = threading.Event()
+        session = profiling.start(iterations=50, interval=0.001,
+                                  directory=str(tmp_path))
+        with pytest.raises(RuntimeError):
+            profiling.start(directory=str(tmp_path))
+        worker = threading.Thread(
+            target=cycle, args=(stop, sampled(session, 'cycle')),
+            name='cycle'
+        )
+        worker.start()
+        try:
+            wait(session)
+        finally:
+            stop.set()
+            worker.join()
+        assert profiling._session is None, 'После N итераций хуки выключены'
+        summary = profiling.status()
+        assert summary['iterations'] >= 50
+        stages = summary['stages']
+        assert stages['get_api_answer']['count'] >= 50
+        assert stages['check_response']['count'] >= 49
+        assert stages['parse_status']['p95_ms'] >= 0
+        with open(summary['report'], encoding='utf-8') as file:
+            assert json.load(file)['stages'].keys() == stages.keys()
+        with open(summary['folded'], encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        assert lines, 'Стеки сняты'
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            assert int(count) > 0 and stack.split(';')[0]
+        assert any(line.startswith('cycle;') and 'held_fetch (test_profiling'
+                   in line for line in lines), 'Рабочий поток в профиле'
+        assert not any(line.startswith('profiler;') for line in lines)
+
+    def test_admin_endpoints(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+        profiling.install(signum=None)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), admin.AdminHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}/profile'
+        try:
+            with urllib.request.urlopen(
+                f'{base}/start?iterations=1000&interval=0.001'
+            ) as response:
+                assert response.status == 202
+                assert json.load(response)['iterations_limit'] == 1000
+            try:
+                urllib.request.urlopen(f'{base}/start')
+            except urllib.error.HTTPError as e:
+                assert e.code == 409, 'Повторное включение отклоняется'
+            else:
+                assert False, 'Ожидался ответ 409'
+            with urllib.request.urlopen(base) as response:
+                assert json.load(response)['active'] is True
+            with urllib.request.urlopen(f'{base}/stop') as response:
+                summary = json.load(response)
+        finally:
+            profiling.stop()
+            server.shutdown()
+            server.server_close()
+        assert summary['active'] is False
+        assert os.path.dirname(summary['folded']) == str(tmp_path)
+        assert os.path.exists(summary['folded'])
+
+    @pytest.mark.skipif(profiling.PROFILE_SIGNAL is None,
+                        reason='Нет SIGUSR2')
+    def test_signal_toggles(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+        previous = signal.getsignal(profiling.PROFILE_SIGNAL)
+        profiling.install()
+        try:
+            os.kill(os.getpid(), profiling.PROFILE_SIGNAL)
+            session = profiling._session
+            assert session is not None, 'Первый сигнал включает'
+            os.kill(os.getpid(), profiling.PROFILE_SIGNAL)
+            wait(session)
+        finally:
+            signal.signal(profiling.PROFILE_SIGNAL, previous)
+            profiling.stop()
+        assert os.listdir(tmp_path), 'Второй сигнал записывает профиль'
@@ -0,0 +1,66 @@
+import tracemalloc
+
+import homework
+import records
+import tracker
+
+
+def api_item(i):
+    return {
+        'id': i,
+        'status': ''.join(['appr', 'oved']),
+        'homework_name': f'user__hw{i}.zip',
+        'reviewer_comment': 'Всё нравится, работа принята.' * 3,
+        'date_updated': '2020-02-13T14:40:57Z',
+        'lesson_name': 'Итоговый проект',
+    }
+
+
+class TestHomework:
+
+    def test_dict_access(self):
+        item = records.Homework.from_api(api_item(1))
+        assert item['homework_name'] == 'user__hw1.zip'
+        assert item.get('date_updated') == 1581604857
+        assert item.get('reviewer_comment') is None
+        assert homework.parse_status(item) == homework.parse_status(
+            api_item(1)
+        ), 'parse_status должна одинаково работать с записью и словарём'
+        assert not hasattr(item, '__dict__')
+
+    def test_status_interned(self):
+        first = records.Homework.from_api(api_item(1))
+        second = records.Homework.from_api(api_item(2))
+        assert first.status is second.status, (
+            'Статусы всех записей должны быть одной строкой'
+        )
+
+    def test_index_memory(self):
+        def measure(items):
+            tracemalloc.start()
+            index = tracker.StatusIndex()
+            for item in items:
+                index.update('acc', item)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return size
+
+        tracemalloc.start()
+        raw = [api_item(i) for i in range(2000)]
+        raw_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert measure(raw) * 3 < raw_size, (
+            'Снимок статусов должен быть заметно меньше словарей API'
+        )
+
+    def test_timestamps(self):
+        assert records.to_timestamp('1970-01-01T00:01:00Z') == 60
+        assert records.to_timestamp('1970-01-02') == 86400
+        assert records.to_timestamp(5) == 5
+        assert records.to_timestamp('1581604857') == 1581604857, (
+            'Секунды из колонки TEXT старой базы'
+        )
+        assert records.to_timestamp('2020-02-13T14:40:57+03:00') == (
+            records.to_timestamp('2020-02-13T11:40:57Z')
+        )
+        assert records.to_timestamp('вчера') is None
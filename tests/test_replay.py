@@ -0,0 +1,73 @@
+import json
+import time
+
+import clock
+import homework
+import replay
+import storage
+from benchmarks.stubs import Stubs
+
+
+def entry(at, status=200, homeworks=(), account='acc'):
+    body = json.dumps({'homeworks': list(homeworks), 'current_date': 1})
+    return {'time': at, 'account': account, 'from_date': 0,
+            'status': status, 'body': body if status == 200 else 'oops'}
+
+
+def work(status):
+    return {'homework_name': 'hw.zip', 'status': status}
+
+
+class TestReplay:
+
+    def test_record_then_replay(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'traffic.jsonl.gz')
+        previous = replay.set_recorder(replay.Recorder(path))
+        try:
+            with Stubs({'change_rate': 1}, {}) as stubs:
+                monkeypatch.setattr(homework, 'ENDPOINT', stubs.practicum_url)
+                for _ in range(3):
+                    homework.get_account_answer('secret-token', 0)
+        finally:
+            replay.set_recorder(previous).close()
+
+        entries = list(replay.read(path))
+        assert len(entries) == 3
+        assert entries[0]['account'] == storage.account_key('secret-token')
+        assert set(entries[0]) == {
+            'time', 'account', 'from_date', 'status', 'body'
+        }, 'Токен не должен попадать в журнал'
+        result = replay.replay(path, speed=0)
+        assert result['responses'] == 3 and result['errors'] == 0
+        assert result['transitions'] == result['messages'] == 3
+
+    def test_replay_filters_and_paces(self, tmp_path):
+        path = tmp_path / 'traffic.jsonl'
+        path.write_text('\n'.join(json.dumps(item) for item in [
+            entry(100.0, homeworks=[work('reviewing')]),
+            entry(100.1, status=500),
+            entry(100.2, homeworks=[work('reviewing')]),
+            entry(100.4, homeworks=[work('approved')]),
+        ]))
+        started = time.monotonic()
+        result = replay.replay(str(path), speed=2)
+        assert time.monotonic() - started >= 0.2, (
+            'Паузы между ответами воспроизводятся с ускорением speed'
+        )
+        assert result['errors'] == 1
+        assert result['transitions'] == result['messages'] == 2
+
+    def test_replay_on_virtual_clock(self, tmp_path):
+        path = tmp_path / 'traffic.jsonl'
+        path.write_text('\n'.join(json.dumps(item) for item in [
+            entry(100.0, homeworks=[work('reviewing')]),
+            entry(130.0, homeworks=[work('approved')]),
+        ]))
+        started = time.monotonic()
+        with clock.use(clock.VirtualClock()):
+            result = replay.replay(str(path), speed=1)
+        assert time.monotonic() - started < 5
+        assert result['seconds'] >= 30, (
+            'Паузы воспроизведения идут по часам модуля clock'
+        )
+        assert result['messages'] == 2
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sqlite3
+import stat
+import time
+
+import clock
+import poller
+import storage
+import tracker
+
+
+class TestStateStore:
+
+    def test_save_and_load(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = storage.StateStore(path)
+        store.save_poll('acc', 100, [('hw1', 'reviewing', None)])
+        store.save_poll('acc', 200, [('hw1', 'approved', None)])
+        store.close()
+
+        store = storage.StateStore(path)
+        assert store.load_cursors() == {'acc': 200}
+        assert store.load_statuses() == [('acc', 'hw1', 'approved', None)]
+        store.close()
+
+    def test_private_file(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        storage.StateStore(path).close()
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600, (
+            'В базе лежат токены, файл доступен только владельцу'
+        )
+
+    def test_updated_round_trip(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        updated = 1581604857
+        store = storage.StateStore(path)
+        store.save_poll('acc', 100, [('hw1', 'rejected', updated)])
+        store.close()
+
+        store = storage.StateStore(path)
+        rows = store.load_statuses()
+        store.close()
+        assert rows == [('acc', 'hw1', 'rejected', updated)]
+        index = tracker.StatusIndex(rows)
+        item = {'homework_name': 'hw1', 'status': 'rejected'}
+        assert not index.is_transition('acc', dict(
+            item, date_updated='2020-02-13T14:40:57Z'
+        ))
+        assert index.is_transition('acc', dict(
+            item, date_updated='2020-02-20T10:00:00Z'
+        )), 'Повторный reject после перезапуска — изменение'
+
+    def test_history(self, tmp_path):
+        store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.save_poll('acc', 100, [('hw1', 'reviewing', None)])
+        store.save_poll('acc', 200, [('hw1', 'approved', None),
+                                     ('hw2', 'reviewing', None)])
+        store.save_poll('other', 200, [('hw3', 'approved', None)])
+        history = store.load_history('acc')
+        assert [row[:2] for row in history] == [
+            ('hw2', 'reviewing'), ('hw1', 'approved'), ('hw1', 'reviewing')
+        ], 'История хранит каждое изменение, новые первыми'
+        assert len(store.load_history('acc', limit=1)) == 1
+        store.close()
+
+    def test_restart_resumes_without_duplicates(self, tmp_path, fake_bot,
+                                                fake_send):
+        path = str(tmp_path / 'state.sqlite3')
+        requested = []
+        now = int(time.time())
+
+        def fetch(token, current_date):
+            requested.append(current_date)
+            return {
+                'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+                'current_date': current_date + 1
+            }
+
+        for _ in range(2):
+            store = storage.StateStore(path)
+            account = poller.Account('token', {1}, now)
+            engine = poller.Poller(
+                [account], fake_bot, fetch=fetch, send=fake_send, store=store
+            )
+            asyncio.run(engine.poll(account))
+            queued = engine.delivery.depth
+            store.close()
+
+        assert requested == [now, now + 1], (
+            'После перезапуска опрос должен продолжаться с сохранённого курсора'
+        )
+        assert queued == 0, 'Статус уже был отправлен до перезапуска'
+
+    def test_locked_store_keeps_schedule(self, fake_bot, fake_send):
+        polls = []
+
+        class LockedStore:
+
+            def load_cursors(self):
+                return {}
+
+            def load_statuses(self):
+                return []
+
+            def save_poll(self, account, from_date, notified):
+                raise sqlite3.OperationalError('database is locked')
+
+        def fetch(token, current_date):
+            polls.append(clock.time())
+            return {'homeworks': [], 'current_date': current_date + 1}
+
+        async def scenario(engine):
+            asyncio.get_running_loop().call_later(3 * 3600, engine.stop)
+            await engine.run()
+
+        with clock.use(clock.VirtualClock()) as virtual:
+            engine = poller.Poller(
+                [poller.Account('token', {1})], fake_bot, fetch=fetch,
+                send=fake_send, store=LockedStore()
+            )
+            virtual.run(scenario(engine))
+        assert len(polls) > 1, 'Ошибка хранилища не убирает аккаунт'
+        assert engine.backoff.get(
+            storage.account_key('token')
+        ).failures == len(polls), 'Пауза после ошибки растёт'
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+import homework
+import poller
+import streaming
+
+
+def chunked(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TestHomeworkStream:
+
+    @pytest.mark.parametrize('size', [1, 7, 4096])
+    def test_items_and_fields(self, size):
+        homeworks = [
+            {'homework_name': f'Работа {i}', 'status': 'approved', 'id': i}
+            for i in range(50)
+        ]
+        data = json.dumps({
+            'current_date': 1234567890,
+            'homeworks': homeworks,
+            'extra': {'nested': [1, 2]},
+        }, ensure_ascii=False).encode()
+
+        stream = streaming.HomeworkStream(chunked(data, size))
+        assert list(stream) == homeworks
+        assert stream.fields == {
+            'current_date': 1234567890, 'extra': {'nested': [1, 2]}
+        }
+        assert stream.summary()['homeworks'] == []
+
+    def test_not_a_list_and_broken_json(self):
+        data = b'{"homeworks": {"status": "approved"}, "current_date": 1}'
+        stream = streaming.HomeworkStream(chunked(data, 5))
+        assert list(stream) == []
+        with pytest.raises(homework.PracticumException):
+            homework.check_response(stream.summary())
+
+        stream = streaming.HomeworkStream(chunked(b'{"homeworks": [{"a"', 3))
+        with pytest.raises(ValueError):
+            list(stream)
+
+    def test_backfill_is_streamed(self, fake_queue):
+        items = [
+            {'homework_name': f'hw{i}', 'status': 'approved'}
+            for i in range(200)
+        ]
+        data = json.dumps({'homeworks': items, 'current_date': 99}).encode()
+
+        def stream(token, current_date):
+            assert current_date == 0
+            return streaming.HomeworkStream(chunked(data, 100))
+
+        def fetch(token, current_date):
+            raise AssertionError('Для старого курсора нужен потоковый разбор')
+
+        account = poller.Account('token', {1}, 0)
+        engine = poller.Poller(
+            [account], None, fetch=fetch, stream=stream, delivery=fake_queue
+        )
+        asyncio.run(engine.poll(account))
+
+        assert len(fake_queue.sent) == 200
+        assert account.current_date == 99
+
+    def test_backfill_error_stops_reader(self, fake_queue):
+        items = [{'homework_name': 'hw', 'status': 'unknown'}] * 500
+        data = json.dumps({'homeworks': items, 'current_date': 99}).encode()
+        read = []
+
+        def stream(token, current_date):
+            def chunks():
+                for chunk in chunked(data, 100):
+                    read.append(chunk)
+                    yield chunk
+            return streaming.HomeworkStream(chunks())
+
+        account = poller.Account('token', {1}, 0)
+        engine = poller.Poller(
+            [account], None, stream=stream, delivery=fake_queue
+        )
+        asyncio.run(engine.poll(account))
+
+        assert account.current_date == 0
+        assert len(read) < len(data) // 100, (
+            'После ошибки обработки чтение ответа должно прекращаться'
+        )
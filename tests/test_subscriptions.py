@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import poller
+import storage
+import subscriptions
+
+
+class TestSubscriptionRegistry:
+
+    def test_load_file_groups_by_token(self, tmp_path):
+        path = tmp_path / 'accounts.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'a', 'chat_ids': [2, '1']},
+            {'token': 'b', 'chat_id': 3},
+        ]))
+        registry = subscriptions.SubscriptionRegistry()
+        registry.load_file(str(path))
+
+        assert len(registry) == 2
+        assert registry.get('a').chats == {'1', '2'}
+        assert [a.token for a in registry.chats_of(3)] == ['b']
+
+    def test_persisted_subscriptions(self, tmp_path):
+        store = storage.StateStore(str(tmp_path / 'state.sqlite3'))
+        registry = subscriptions.SubscriptionRegistry(store)
+        account, created = registry.add('a', 1, persist=True)
+        assert created
+        assert registry.add('a', 2, persist=True) == (account, False)
+        registry.remove('a', 1)
+
+        registry = subscriptions.SubscriptionRegistry(store)
+        registry.load_store()
+        assert registry.get('a').chats == {'2'}
+        store.close()
+
+    def test_one_poll_fans_out_to_subscribers(self, fake_queue):
+        requested = []
+
+        def fetch(token, current_date):
+            requested.append(token)
+            return {
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': current_date + 1
+            }
+
+        registry = subscriptions.SubscriptionRegistry()
+        for chat in (1, 2, 3):
+            registry.add('token', chat)
+        engine = poller.Poller(
+            registry.accounts(), None, fetch=fetch, delivery=fake_queue
+        )
+        asyncio.run(engine.poll(registry.get('token')))
+
+        assert requested == ['token']
+        assert sorted(chat for chat, _ in fake_queue.sent) == ['1', '2', '3']
+        assert len({id(text) for _, text in fake_queue.sent}) == 1, (
+            'Сообщение должно формироваться один раз на все чаты'
+        )
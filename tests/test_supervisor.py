@@ -0,0 +1,120 @@
+import os
+import time
+
+import subscriptions
+import supervisor
+
+
+class FakeEngine:
+
+    def __init__(self):
+        self.polled = set()
+        self.inflight = set()
+
+    def add(self, account):
+        self.polled.add(account.key)
+
+    def drop(self, account):
+        self.polled.discard(account.key)
+
+
+def echo_worker(worker_id, members, connection, shares):
+    # Запускается в отдельном процессе: пишет полученные составы в файл
+    path = os.path.join(os.environ['SUPERVISOR_TEST_DIR'], f'{worker_id}')
+    with open(path, 'a') as file:
+        file.write(f'{members}\n')
+        file.flush()
+        while True:
+            message = connection.recv()
+            if message is None:
+                return
+            file.write(f'{message}\n')
+            file.flush()
+
+
+class TestHashRing:
+
+    def test_balance_and_minimal_moves(self):
+        keys = [f'account{i}' for i in range(3000)]
+        ring = supervisor.HashRing([0, 1, 2])
+        before = {key: ring.node_for(key) for key in keys}
+        for node in (0, 1, 2):
+            share = list(before.values()).count(node)
+            assert 600 < share < 1400, 'Аккаунты должны делиться примерно поровну'
+
+        grown = supervisor.HashRing([0, 1, 2, 3])
+        moved = [key for key in keys if grown.node_for(key) != before[key]]
+        assert all(grown.node_for(key) == 3 for key in moved), (
+            'При добавлении обработчика аккаунты переезжают только к нему'
+        )
+        assert len(moved) < len(keys) / 2
+        assert supervisor.HashRing().node_for('a') is None
+
+
+class TestShard:
+
+    def test_locks_are_exclusive(self, tmp_path):
+        first = supervisor.AccountLocks(str(tmp_path))
+        second = supervisor.AccountLocks(str(tmp_path))
+        assert first.acquire('a') and first.acquire('a')
+        assert not second.acquire('a'), 'Блокировку держит другой владелец'
+        first.release('a')
+        assert second.acquire('a')
+
+    def test_rebalance_hands_over_accounts(self, tmp_path):
+        registry = subscriptions.SubscriptionRegistry()
+        for i in range(50):
+            registry.add(f'token{i}', i)
+        keys = {account.key for account in registry.accounts()}
+        shards = [
+            supervisor.Shard(i, registry, FakeEngine(),
+                             supervisor.AccountLocks(str(tmp_path)))
+            for i in range(2)
+        ]
+        for shard in shards:
+            shard.rebalance([0, 1])
+        first, second = (shard.engine.polled for shard in shards)
+        assert first and second and not first & second
+        assert first | second == keys
+
+        # Обработчик 1 уходит, но его опрос ещё идёт
+        busy = next(iter(second))
+        shards[1].engine.inflight.add(busy)
+        shards[1].rebalance([0])
+        shards[0].rebalance([0])
+        assert busy not in shards[0].engine.polled, (
+            'Аккаунт нельзя забирать, пока прежний владелец его опрашивает'
+        )
+        shards[1].engine.inflight.clear()
+        shards[1].rebalance()
+        shards[0].rebalance()
+        assert shards[0].engine.polled == keys
+        assert not shards[1].engine.polled
+
+
+class TestSupervisor:
+
+    def test_restart_and_broadcast(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('SUPERVISOR_TEST_DIR', str(tmp_path))
+        boss = supervisor.Supervisor(2, target=echo_worker, restart_delay=0)
+        try:
+            boss.scale(2)
+            assert boss.members == [0, 1]
+            boss.processes[1].kill()
+            boss.processes[1].join(10)
+            boss.check()
+            assert boss.members == [0, 1], 'Упавший обработчик перезапущен'
+            boss.scale(3)
+            deadline = time.time() + 10
+            log = tmp_path / '0'
+            while time.time() < deadline:
+                if log.exists() and '[0, 1, 2]' in log.read_text():
+                    break
+                time.sleep(0.05)
+            assert '[0, 1, 2]' in log.read_text(), (
+                'Новый состав рассылается обработчикам'
+            )
+        finally:
+            for worker_id in list(boss.processes):
+                boss._retire(worker_id)
+        assert not boss.processes
@@ -0,0 +1,28 @@
+import tracker
+
+
+class TestStatusIndex:
+
+    def test_only_transitions(self):
+        index = tracker.StatusIndex([('acc', 'hw1', 'reviewing', '2020-01-01')])
+        homeworks = [
+            {'homework_name': 'hw1', 'status': 'reviewing',
+             'date_updated': '2020-01-01'},
+            {'homework_name': 'hw2', 'status': 'approved'},
+        ]
+        assert index.diff('acc', homeworks) == [homeworks[1]]
+
+        homeworks[0]['status'] = 'rejected'
+        assert index.diff('acc', homeworks) == homeworks
+
+    def test_same_status_newer_review(self):
+        index = tracker.StatusIndex([('acc', 'hw1', 'rejected', '2020-01-01')])
+        item = {'homework_name': 'hw1', 'status': 'rejected',
+                'date_updated': '2020-02-01'}
+        assert index.diff('acc', [item]) == [item], (
+            'Повторная проверка с тем же статусом — тоже изменение'
+        )
+        index.update('acc', item)
+        assert index.diff('acc', [item]) == []
+        assert index.diff('other', [item]) == [item]
+        assert len(index) == 1
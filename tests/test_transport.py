@@ -0,0 +1,116 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import homework
+import transport
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0
+    status = 200
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        time.sleep(self.delay)
+        body = b'{"homeworks": [], "current_date": 1}'
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.clients = set()
+    server.handle_error = lambda request, address: None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestTransport:
+
+    def test_keep_alive_reuses_connection(self, stub_server):
+        url = f'http://127.0.0.1:{stub_server.server_port}/'
+        client = transport.Transport(pool_size=2)
+        for _ in range(5):
+            assert client.get(url).json()['current_date'] == 1
+        client.close()
+        assert len(stub_server.clients) == 1, (
+            'Запросы транспорта должны переиспользовать соединение'
+        )
+
+    def test_read_timeout(self, stub_server, monkeypatch):
+        monkeypatch.setattr(StubHandler, 'delay', 0.5)
+        url = f'http://127.0.0.1:{stub_server.server_port}/'
+        client = transport.Transport(read_timeout=0.1)
+        with pytest.raises(requests.exceptions.Timeout):
+            client.get(url)
+        client.close()
+
+    def test_streamed_error_releases_connection(self, stub_server,
+                                                monkeypatch):
+        monkeypatch.setattr(StubHandler, 'status', 503)
+        url = f'http://127.0.0.1:{stub_server.server_port}/'
+        monkeypatch.setattr(homework, 'ENDPOINT', url)
+        client = transport.Transport(pool_size=2)
+        monkeypatch.setattr(transport, '_transport', client)
+        failures = []
+
+        def backfill():
+            for _ in range(3):
+                with pytest.raises(homework.UpstreamError):
+                    homework.stream_account_answer('token', 0)
+                failures.append(1)
+
+        thread = threading.Thread(target=backfill, daemon=True)
+        thread.start()
+        thread.join(5)
+        client.close()
+        assert len(failures) == 3, (
+            'Потоковый ответ с ошибкой должен возвращать соединение в пул'
+        )
+
+    def test_proxies_read_once(self, stub_server, monkeypatch):
+        monkeypatch.setenv('HTTPS_PROXY', 'http://proxy.local:3128')
+        client = transport.Transport()
+        assert client.session.proxies == {'https': 'http://proxy.local:3128'}
+
+        def environ_proxies(*args, **kwargs):
+            raise AssertionError('Окружение читается на каждом запросе')
+
+        monkeypatch.setattr(
+            requests.sessions, 'get_environ_proxies', environ_proxies
+        )
+        url = f'http://127.0.0.1:{stub_server.server_port}/'
+        assert client.get(url).json()['current_date'] == 1
+        client.close()
+
+    def test_no_proxy(self, stub_server, monkeypatch):
+        monkeypatch.setenv('HTTP_PROXY', 'http://127.0.0.1:9')
+        monkeypatch.setenv('NO_PROXY', '.yandex.ru')
+        client = transport.Transport()
+        monkeypatch.delenv('NO_PROXY')
+        assert client.no_proxy == '.yandex.ru'
+        assert transport.bypass_proxy(homework.ENDPOINT, client.no_proxy)
+        assert not transport.bypass_proxy(
+            'https://api.telegram.org/', client.no_proxy
+        ), 'Хосты не из NO_PROXY идут через прокси'
+
+        url = f'http://127.0.0.1:{stub_server.server_port}/'
+        assert client.get(url).json()['current_date'] == 1, (
+            'Локальные заглушки запрашиваются без прокси'
+        )
+        client.close()
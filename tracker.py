@@ -0,0 +1,95 @@
+"""Индекс последних статусов для поиска реальных изменений."""
+from records import Homework, to_timestamp
+
+
+class StatusIndex:
+    """
+    Снимок последних отправленных статусов домашних работ.
+
+    {account: {homework_name: records.Homework}}. Ответ API
+    сравнивается со снимком, и уведомление получают только работы,
+    у которых сменился статус или обновилась дата проверки
+    (например, повторный reject после доработки).
+    """
+
+    def __init__(self, rows=()):
+        self._index = {}
+        for account, name, status, updated in rows:
+            self._index.setdefault(account, {})[name] = Homework(
+                name, status, updated
+            )
+
+    def reset(self, account: str, rows=()):
+        """
+        Заменить снимок аккаунта.
+
+        :param rows: Строки (account, name, status, updated)
+        """
+        self._index[account] = {
+            name: Homework(name, status, updated)
+            for _, name, status, updated in rows
+        }
+
+    def __len__(self):
+        return sum(len(homeworks) for homeworks in self._index.values())
+
+    def get(self, account: str, name: str):
+        """
+        Последний статус работы.
+
+        :return: records.Homework или None
+        """
+        return self._index.get(account, {}).get(name)
+
+    def homeworks(self, account: str) -> list:
+        """Снимок работ аккаунта: records.Homework, новые первыми."""
+        return sorted(
+            self._index.get(account, {}).values(),
+            key=lambda item: item.updated or 0, reverse=True
+        )
+
+    def has_status(self, account: str, status: str) -> bool:
+        """Есть ли у аккаунта работа в статусе status."""
+        return any(
+            item.status == status
+            for item in self._index.get(account, {}).values()
+        )
+
+    def is_transition(self, account: str, item) -> bool:
+        """
+        Проверка, является ли запись из ответа API изменением.
+
+        :param account: Идентификатор аккаунта
+        :param item: records.Homework или словарь из ответа API
+        :return: True, если о ней нужно уведомить
+        """
+        previous = self.get(account, item['homework_name'])
+        if previous is None:
+            return True
+        if item['status'] != previous.status:
+            return True
+        updated = to_timestamp(item.get('date_updated'))
+        return bool(
+            updated and previous.updated and updated > previous.updated
+        )
+
+    def diff(self, account: str, homeworks: list) -> list:
+        """
+        Изменения в пачке домашних работ.
+
+        Если работа встречается в пачке несколько раз,
+        учитывается последняя запись.
+        :param account: Идентификатор аккаунта
+        :param homeworks: Список домашних работ из check_response
+        :return: Работы, о которых нужно уведомить
+        """
+        latest = {item['homework_name']: item for item in homeworks}
+        return [
+            item for item in latest.values()
+            if self.is_transition(account, item)
+        ]
+
+    def update(self, account: str, item):
+        """Запомнить отправленный статус работы."""
+        item = Homework.from_api(item)
+        self._index.setdefault(account, {})[item.name] = item
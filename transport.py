@@ -0,0 +1,131 @@
+"""Общий HTTP-транспорт с пулом соединений и таймаутами."""
+import ipaddress
+import logging
+import os
+import threading
+import urllib.request
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+# Число соединений на хост; по умолчанию — по числу одновременных опросов
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', os.getenv('POLL_CONCURRENCY', 32)))
+
+
+def environment_proxies() -> dict:
+    """Прокси из HTTPS_PROXY, HTTP_PROXY, ALL_PROXY и NO_PROXY (ключ no)."""
+    return urllib.request.getproxies_environment()
+
+
+def bypass_proxy(url: str, no_proxy: str = None) -> bool:
+    """
+    Идёт ли запрос к url мимо прокси.
+
+    Локальные адреса (заглушки API в тестах и бенчмарках) запрашиваются
+    напрямую всегда, остальные хосты — если они есть в списке no_proxy.
+    :param url: Адрес запроса
+    :param no_proxy: Значение NO_PROXY
+    :return: True, если прокси не нужен
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    if host == 'localhost':
+        return True
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return True
+    except ValueError:
+        pass
+    if not no_proxy:
+        return False
+    return bool(urllib.request.proxy_bypass_environment(
+        parts.netloc, {'no': no_proxy}
+    ))
+
+
+class Transport:
+    """
+    Сессия requests с пулом keep-alive соединений.
+
+    Соединения к одному хосту переиспользуются между запросами, поэтому
+    TLS-рукопожатие выполняется один раз на соединение пула, а не на
+    каждый опрос. Если все соединения заняты, запрос ждёт свободное
+    (pool_block), а не открывает лишнее. Прокси и NO_PROXY из окружения
+    читаются один раз при создании: с trust_env requests перечитывает
+    переменные окружения на каждом запросе. Нужен ли прокси хосту,
+    проверяется один раз на хост.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT,
+                 pool_connections: int = 4, proxies: dict = None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.trust_env = False
+        proxies = dict(environment_proxies() if proxies is None else proxies)
+        self.no_proxy = proxies.pop('no', None)
+        self.session.proxies.update(proxies)
+        # None в прокси запроса убирает прокси сессии для этой схемы
+        self._direct = dict.fromkeys(proxies)
+        self._bypass = {}
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_size,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url: str, **kwargs):
+        """
+        GET-запрос через пул с таймаутом по умолчанию.
+
+        :param url: Адрес
+        :param kwargs: Аргументы requests (headers, params, timeout, ...)
+        :return: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if self._direct:
+            host = urlsplit(url).netloc
+            bypass = self._bypass.get(host)
+            if bypass is None:
+                bypass = self._bypass[host] = bypass_proxy(url, self.no_proxy)
+            if bypass:
+                kwargs.setdefault('proxies', self._direct)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        """Закрыть все соединения пула."""
+        self.session.close()
+
+
+_transport = None
+_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """Общий транспорт процесса, создаётся при первом обращении."""
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = Transport()
+                logging.debug(
+                    'HTTP-пул: %d соединений, таймауты %s',
+                    POOL_SIZE, _transport.timeout
+                )
+    return _transport
+
+
+def set_transport(transport: Transport):
+    """Заменить общий транспорт (например, с другими таймаутами)."""
+    global _transport
+    with _lock:
+        if _transport is not None and _transport is not transport:
+            _transport.close()
+        _transport = transport